@@ -0,0 +1,76 @@
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words too common in contracts and snippets to say anything about similarity
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+any all such shall may not no other than these those which who whom under into upon
+""".split())
+
+# Results from these sources get a flat boost on top of their text score
+LEGAL_SOURCES = ("SEC EDGAR", "Court Records", "Government")
+SOURCE_BOOST = 20
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of text, without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LocalRanker:
+    """TF-IDF cosine similarity of search results to one contract, scored without any API.
+
+    The contract is tokenised and counted once. Each call to scores() builds a dense
+    term matrix for the results over the contract's vocabulary and scores them all in one
+    vectorised pass: sublinear term frequencies, smoothed IDF over the results plus the contract,
+    L2-normalised vectors. Scores are the cosine times 100, plus SOURCE_BOOST for legal sources,
+    capped at 100, which keeps the scale of the keyword-overlap scores they replace.
+    """
+
+    def __init__(self, contract_text):
+        terms, counts = np.unique(np.array(tokenize(contract_text) or [""]), return_counts=True)
+        self.vocabulary = {term: index for index, term in enumerate(terms.tolist())}
+        self.contract_tf = np.log1p(counts.astype(np.float64))
+
+    def scores(self, results):
+        """Similarity scores (0-100) of result dicts with "title", "snippet" and "source", in order"""
+        if not results:
+            return np.zeros(0)
+        known = len(self.vocabulary)
+        # Words only the results use count towards their vectors' length, not the match
+        extra = {}
+        rows, columns = [], []
+        for row, result in enumerate(results):
+            for token in tokenize(result["title"] + " " + result["snippet"]):
+                column = self.vocabulary.get(token)
+                if column is None:
+                    column = extra.setdefault(token, known + len(extra))
+                rows.append(row)
+                columns.append(column)
+
+        size = known + len(extra)
+        counts = np.bincount(
+            np.array(rows, dtype=np.int64) * size + np.array(columns, dtype=np.int64),
+            minlength=len(results) * size
+        ).reshape(len(results), size)
+        result_tf = np.log1p(counts.astype(np.float64))
+
+        # The contract counts as one more document for document frequencies
+        document_frequency = (counts > 0).sum(axis=0)
+        document_frequency[:known] += 1
+        documents = len(results) + 1
+        idf = np.log((1 + documents) / (1 + document_frequency)) + 1
+
+        contract = np.zeros(size)
+        contract[:known] = self.contract_tf * idf[:known]
+        contract /= np.linalg.norm(contract) or 1.0
+        weighted = result_tf * idf
+        norms = np.linalg.norm(weighted, axis=1)
+        norms[norms == 0] = 1.0
+        cosine = (weighted @ contract) / norms
+
+        boost = np.array([SOURCE_BOOST if result["source"] in LEGAL_SOURCES else 0 for result in results])
+        return np.minimum(cosine * 100 + boost, 100)
@@ -13,6 +13,14 @@ const chunkSchema = new mongoose.Schema({
         type: Number,
         default: 0
     },
+    endIndex: {
+        type: Number,
+        default: 0
+    },
+    page: {
+        type: Number,
+        default: null
+    },
     wordCount: {
         type: Number,
         default: 0
@@ -75,9 +83,19 @@ const ocrResultSchema = new mongoose.Schema({
     chunks: [chunkSchema],
     processingStatus: {
         type: String,
-        enum: ['pending', 'processing', 'completed', 'failed'],
+        enum: ['pending', 'processing', 'completed', 'partial', 'failed'],
         default: 'pending'
-    },    error: {
+    },
+    // Pages a 'partial' result is missing (OCR deadline hit), and the upload kept to resume it
+    unprocessedPages: {
+        type: [Number],
+        default: []
+    },
+    sourcePath: {
+        type: String,
+        default: null
+    },
+    error: {
         type: String,
         default: null
     },
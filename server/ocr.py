@@ -1,138 +1,1546 @@
 import sys
 import json
-from langchain_text_splitters import CharacterTextSplitter
+import io
 import os
-import pytesseract
-from PIL import Image
-from langchain_core.documents import Document
-import fitz  # PyMuPDF for PDF processing
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ocr_cache import DiskCache, file_cache_key, page_cache_key
+from ocr_chunker import TextChunker
+from ocr_format import compact_result, encode_binary
+from ocr_timing import Timings, profile_job
+
+# Heavy dependencies (PyMuPDF, Pillow, pytesseract, NumPy) are imported on first use so that
+# paths which never need them, such as usage errors or image-only jobs that never touch fitz,
+# don't pay for them on every spawned request. See --startup-profile.
+STARTUP_PROFILE_MODULES = [
+    "fitz",
+    "PIL.Image",
+    "pytesseract",
+    "numpy",
+]
+STARTUP_BUDGET_MS = float(os.environ.get('OCR_STARTUP_BUDGET_MS', 300))
 
 # Configure Tesseract path (update this to your Tesseract installation path)
 tesseract_path = os.environ.get('TESSERACT_CMD', r'C:\Program Files\Tesseract-OCR\tesseract.exe')
-pytesseract.pytesseract.tesseract_cmd = tesseract_path
+
+TESSERACT_CONFIG = "--oem 1 --psm 6"
+
+# --format values: the standard result, chunks as offsets into the text, or length-prefixed binary
+RESULT_FORMATS = ("json", "compact", "binary")
+
+# Bump when extraction output changes so cached results from older code are not reused
+RESULT_FORMAT_VERSION = 4
+
+# Whole-file result cache and per-page OCR cache; set either size to 0 to disable it
+OCR_CACHE_DIR = os.environ.get('OCR_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'legal-ai-ocr-cache'))
+OCR_CACHE_MAX_MB = float(os.environ.get('OCR_CACHE_MAX_MB', 256))
+OCR_PAGE_CACHE_MAX_MB = float(os.environ.get('OCR_PAGE_CACHE_MAX_MB', 64))
+
+# Image-only pages sent to one Tesseract run; 1 runs Tesseract once per page
+OCR_TESSERACT_BATCH_PAGES = int(os.environ.get('OCR_TESSERACT_BATCH_PAGES', 1))
+
+# Tiered OCR: a fast first pass on a downscaled grayscale copy, with only the regions or pages whose
+# mean word confidence falls below the threshold re-read at full resolution
+OCR_TIERED = os.environ.get('OCR_TIERED', 'false').lower() == 'true'
+OCR_TIER_RENDER_DPI = int(os.environ.get('OCR_TIER_RENDER_DPI', 300))
+OCR_FAST_SCALE = float(os.environ.get('OCR_FAST_SCALE', 0.5))
+OCR_CONFIDENCE_THRESHOLD = float(os.environ.get('OCR_CONFIDENCE_THRESHOLD', 80))
+TESSERACT_ACCURATE_CONFIG = "--oem 1 --psm 3"
+
+# Preprocessing before OCR: resample to OCR_TARGET_DPI, grayscale, binarise, deskew and skip blank pages
+OCR_PREPROCESS = os.environ.get('OCR_PREPROCESS', 'true').lower() == 'true'
+OCR_TARGET_DPI = int(os.environ.get('OCR_TARGET_DPI', 300))
+OCR_MAX_SKEW_DEGREES = float(os.environ.get('OCR_MAX_SKEW_DEGREES', 5))
+OCR_BLANK_INK_RATIO = float(os.environ.get('OCR_BLANK_INK_RATIO', 0.0001))
+
+# On pages with a text layer, embedded images that text blocks cover at most
+# OCR_REGION_MAX_TEXT_COVERAGE of (signatures, stamps, scans with a typed Bates number) are OCR'd
+# on their own when both sides are at least OCR_REGION_MIN_POINTS (1/72 inch) long
+OCR_IMAGE_REGIONS = os.environ.get('OCR_IMAGE_REGIONS', 'true').lower() == 'true'
+OCR_REGION_MIN_POINTS = float(os.environ.get('OCR_REGION_MIN_POINTS', 36))
+OCR_REGION_MAX_TEXT_COVERAGE = float(os.environ.get('OCR_REGION_MAX_TEXT_COVERAGE', 0.1))
+# Decorative images (letterhead logos, photos, coloured graphics) are skipped: a region must cover at
+# least OCR_REGION_MIN_PAGE_SHARE of the page, and in a low-resolution preview of it no more than
+# OCR_REGION_MAX_COLOUR_SHARE of the pixels may be coloured and no more than OCR_REGION_MAX_INK_SHARE dark
+OCR_REGION_MIN_PAGE_SHARE = float(os.environ.get('OCR_REGION_MIN_PAGE_SHARE', 0.05))
+OCR_REGION_MAX_COLOUR_SHARE = float(os.environ.get('OCR_REGION_MAX_COLOUR_SHARE', 0.2))
+OCR_REGION_MAX_INK_SHARE = float(os.environ.get('OCR_REGION_MAX_INK_SHARE', 0.35))
+OCR_REGION_PREVIEW_DPI = 36
+# Regions are rendered at their embedded image's own resolution, capped at this
+OCR_REGION_MAX_DPI = 600
+
+# Default time limits per job; 0 means none. Work still running at the deadline is stopped and
+# the result is returned with "partial": true and the pages that weren't done
+OCR_DEADLINE_SECONDS = float(os.environ.get('OCR_DEADLINE_SECONDS', 0))
+OCR_PAGE_TIMEOUT_SECONDS = float(os.environ.get('OCR_PAGE_TIMEOUT_SECONDS', 0))
+
+# Add a per-stage and per-page "timings" block to every result (jobs can also ask with "timings")
+OCR_TIMINGS = os.environ.get('OCR_TIMINGS', 'false').lower() == 'true'
+# When set, each process_file job is run under cProfile and tracemalloc and dumped into this directory
+OCR_PROFILE_DIR = os.environ.get('OCR_PROFILE_DIR')
+
+def _open_cache(directory, max_bytes, **kwargs):
+    """A DiskCache in directory, or None (with a warning on stderr) when the directory is unusable"""
+    try:
+        return DiskCache(directory, max_bytes, **kwargs)
+    except OSError as e:
+        print(f"OCR cache disabled, {directory} is unusable: {e}", file=sys.stderr)
+        return None
+
+
+def _cache_store(cache, key, value):
+    """Store value in a DiskCache; a failed write (full disk, permissions) only costs a later job the work"""
+    try:
+        cache.set(key, value)
+    except OSError as e:
+        print(f"OCR cache write to {cache.directory} failed: {e}", file=sys.stderr)
+
+
+def _tesseract():
+    """Import pytesseract on first use and point it at the configured binary"""
+    import pytesseract
+    pytesseract.pytesseract.tesseract_cmd = tesseract_path
+    return pytesseract
+
+
+# MuPDF is not thread-safe, so every fitz call made while serving concurrent jobs goes through this lock
+_FITZ_LOCK = threading.Lock()
+
+
+def _init_page_worker():
+    """Keep each pool worker's Tesseract single-threaded; the pool itself provides the parallelism"""
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def _render_page(page, dpi=None, clip=None):
+    """Render a PDF page, or the clip rectangle of it, to a picklable (mode, size, samples) triple of raw pixels"""
+    if dpi is None:
+        pix = page.get_pixmap(clip=clip)
+    else:
+        import fitz
+
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, clip=clip)
+    mode = {1: "L", 3: "RGB", 4: "RGBA"}[pix.n]
+    return mode, (pix.width, pix.height), pix.samples
+
+
+def _image_regions(page):
+    """(clip rectangle, native dpi) of each image on a text-layer page whose text its text layer lacks"""
+    import fitz
+
+    # Most text-layer pages have no images, so skip the layout work for them
+    if not page.get_images():
+        return []
+    text_boxes = [fitz.Rect(block[:4]) for block in page.get_text("blocks") if block[4].strip()]
+    regions = []
+    for image in page.get_image_info():
+        placed = fitz.Rect(image["bbox"])
+        box = placed & page.rect
+        if box.is_empty or min(box.width, box.height) < OCR_REGION_MIN_POINTS:
+            continue
+        if box.get_area() < OCR_REGION_MIN_PAGE_SHARE * page.rect.get_area():
+            continue
+        covered = sum((box & text_box).get_area() for text_box in text_boxes)
+        if covered > OCR_REGION_MAX_TEXT_COVERAGE * box.get_area():
+            continue
+        if _decorative(page, box):
+            continue
+        regions.append((box, min(round(image["width"] * 72 / placed.width), OCR_REGION_MAX_DPI)))
+    return regions
+
+
+def _decorative(page, box):
+    """Whether the page area in box looks like a logo, photo or graphic rather than a scan of text"""
+    import fitz
+    import numpy as np
+
+    pix = page.get_pixmap(dpi=OCR_REGION_PREVIEW_DPI, colorspace=fitz.csRGB, clip=box, alpha=False)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n).astype(np.int16)
+    # Scanned paper and ink are close to grey; logos and photos are not
+    colour = (pixels.max(axis=2) - pixels.min(axis=2) > 48).mean()
+    ink = (pixels.mean(axis=2) < 128).mean()
+    return colour > OCR_REGION_MAX_COLOUR_SHARE or ink > OCR_REGION_MAX_INK_SHARE
+
+
+def region_settings():
+    """Image region settings, or None when text-layer pages are never OCR'd"""
+    if not OCR_IMAGE_REGIONS:
+        return None
+    return {
+        "min_points": OCR_REGION_MIN_POINTS,
+        "max_text_coverage": OCR_REGION_MAX_TEXT_COVERAGE,
+        "min_page_share": OCR_REGION_MIN_PAGE_SHARE,
+        "max_colour_share": OCR_REGION_MAX_COLOUR_SHARE,
+        "max_ink_share": OCR_REGION_MAX_INK_SHARE,
+        "max_dpi": OCR_REGION_MAX_DPI
+    }
+
+
+def _prepare_image(img, scale=1.0):
+    """Run the preprocessing stage when enabled: (image to OCR or None if blank, page record fields)"""
+    if not OCR_PREPROCESS:
+        return img, {}
+    from ocr_preprocess import preprocess
+
+    prepared, timings = preprocess(img, scale, OCR_MAX_SKEW_DEGREES, OCR_BLANK_INK_RATIO)
+    info = {"preprocess": timings}
+    if prepared is None:
+        info["blank"] = True
+    return prepared, info
+
+
+def _image_scale(img):
+    """Resampling factor for an uploaded photo or scan, or 1 when preprocessing is off"""
+    if not OCR_PREPROCESS:
+        return 1.0
+    from ocr_preprocess import photo_scale
+
+    return photo_scale(img.size, OCR_TARGET_DPI)
+
+
+class _PageTimeout(Exception):
+    """An OCR task ran out of time"""
+
+
+class _Budget:
+    """Time an OCR task may spend: its per-page timeout or the job's wall-clock deadline, whichever ends first"""
+
+    def __init__(self, limits=None, pages=1):
+        page_timeout, deadline_at = limits or (None, None)
+        self.ends_at = None
+        if page_timeout:
+            self.ends_at = time.time() + page_timeout * pages
+        if deadline_at:
+            self.ends_at = deadline_at if self.ends_at is None else min(self.ends_at, deadline_at)
+
+    def expired(self):
+        return self.ends_at is not None and time.time() >= self.ends_at
+
+    def timeout(self):
+        """Seconds to allow the next Tesseract call (0 for no limit); raises _PageTimeout once spent"""
+        if self.ends_at is None:
+            return 0
+        left = self.ends_at - time.time()
+        if left <= 0:
+            raise _PageTimeout()
+        return left
+
+
+def _run_tesseract(method, image, config, budget, **kwargs):
+    """Call a pytesseract function, killing Tesseract when the budget runs out"""
+    if not isinstance(image, str) and image.mode in ("1", "L", "RGB"):
+        # pytesseract writes in-memory images to a temp file in their format, PNG when unset;
+        # uncompressed PNM costs no encode (and no lossy JPEG re-encode for uploaded photos)
+        image.format = "PPM"
+    try:
+        return method(image, config=config, timeout=budget.timeout(), **kwargs)
+    except RuntimeError as e:
+        if str(e) == "Tesseract process timeout":
+            raise _PageTimeout()
+        raise
+
+
+def _tesseract_texts(images, budget):
+    """OCR PIL images with a single Tesseract run, one text per image.
+
+    Several images are written as uncompressed PNM files to a private temp directory and passed
+    to Tesseract as a file list, so the process spawn and model load are paid once per group. The
+    output has a form feed after each page; if the page count doesn't come back intact, the
+    group is OCR'd image by image instead.
+    """
+    pytesseract = _tesseract()
+    if len(images) <= 1:
+        return [_run_tesseract(pytesseract.image_to_string, img, TESSERACT_CONFIG, budget).strip() for img in images]
+
+    with tempfile.TemporaryDirectory(prefix="ocr_batch_") as batch_dir:
+        paths = []
+        for i, img in enumerate(images):
+            if img.mode not in ("L", "RGB"):
+                img = img.convert("RGB")
+            path = os.path.join(batch_dir, f"page_{i}.pnm")
+            img.save(path, format="PPM")
+            paths.append(path)
+        list_path = os.path.join(batch_dir, "pages.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(paths) + "\n")
+        output = _run_tesseract(pytesseract.image_to_string, list_path, TESSERACT_CONFIG, budget)
+
+    texts = output.split("\f")
+    if len(texts) not in (len(images), len(images) + 1):
+        return [_run_tesseract(pytesseract.image_to_string, img, TESSERACT_CONFIG, budget).strip() for img in images]
+    return [text.strip() for text in texts[:len(images)]]
+
+
+def _ocr_page_images(page_images, limits=None):
+    """Pool task: OCR a group of rendered PDF pages from their raw pixels, one {"text"} per page.
+
+    The group shares a single Tesseract run; blank pages found by preprocessing are left out of it.
+    limits is (page timeout, deadline as a time.time() value); pages the run couldn't finish within
+    them come back with "timed_out".
+    """
+    try:
+        from PIL import Image
+
+        budget = _Budget(limits, len(page_images))
+        if budget.expired():
+            # Queued behind other work until the deadline passed
+            return [{"text": "", "timed_out": True} for _ in page_images]
+        start = time.perf_counter()
+        results, images = [], []
+        for mode, size, samples in page_images:
+            img, info = _prepare_image(Image.frombytes(mode, size, samples))
+            results.append({"text": "", **info})
+            if img is not None:
+                images.append((len(results) - 1, img))
+        try:
+            texts = _tesseract_texts([img for _, img in images], budget)
+        except _PageTimeout:
+            for i, _ in images:
+                results[i]["timed_out"] = True
+            return _share_ocr_ms(results, start)
+        for (i, _), text in zip(images, texts):
+            results[i]["text"] = text
+        return _share_ocr_ms(results, start)
+    except Exception as e:
+        # Re-raise as a plain Exception so it pickles back from pool workers
+        raise Exception(f"Error extracting text from image: {str(e)}")
+
+
+def _ocr_page_regions(regions, limits=None):
+    """Pool task: OCR the image regions of a text-layer page.
+
+    regions are (raw pixels, native dpi) pairs; each is resampled towards OCR_TARGET_DPI by
+    preprocessing and all of them share one Tesseract run. Returns a one-item list, like the other
+    page tasks, whose "region_texts" has each region's text in order ("" for blank ones).
+    """
+    try:
+        from PIL import Image
+
+        budget = _Budget(limits)
+        if budget.expired():
+            return [{"text": "", "timed_out": True}]
+        start = time.perf_counter()
+        images, positions = [], []
+        for position, ((mode, size, samples), dpi) in enumerate(regions):
+            scale = 1.0
+            if OCR_PREPROCESS:
+                from ocr_preprocess import MAX_UPSCALE
+
+                scale = min(OCR_TARGET_DPI / dpi, MAX_UPSCALE)
+            img, _ = _prepare_image(Image.frombytes(mode, size, samples), scale)
+            if img is not None:
+                images.append(img)
+                positions.append(position)
+        texts = [""] * len(regions)
+        try:
+            for position, text in zip(positions, _tesseract_texts(images, budget)):
+                texts[position] = text
+        except _PageTimeout:
+            return [{"text": "", "timed_out": True}]
+        return _share_ocr_ms([{"region_texts": texts}], start)
+    except Exception as e:
+        raise Exception(f"Error extracting text from image: {str(e)}")
+
+
+def _share_ocr_ms(results, start):
+    """Split the time since start evenly over a group's results, as each page's ocr_ms"""
+    ocr_ms = (time.perf_counter() - start) * 1000 / max(1, len(results))
+    for result in results:
+        result["ocr_ms"] = ocr_ms
+    return results
+
+
+def _ocr_blocks(img, config, budget):
+    """Run image_to_data and group the recognised words into text blocks with their confidences and boxes"""
+    pytesseract = _tesseract()
+    data = _run_tesseract(pytesseract.image_to_data, img, config, budget, output_type=pytesseract.Output.DICT)
+    blocks = {}
+    for i, word in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if confidence < 0 or not word.strip():
+            continue
+        left, top = data["left"][i], data["top"][i]
+        right, bottom = left + data["width"][i], top + data["height"][i]
+        block = blocks.get(data["block_num"][i])
+        if block is None:
+            block = blocks[data["block_num"][i]] = {"lines": {}, "confs": [], "box": [left, top, right, bottom]}
+        block["lines"].setdefault((data["par_num"][i], data["line_num"][i]), []).append(word)
+        block["confs"].append(confidence)
+        box = block["box"]
+        block["box"] = [min(box[0], left), min(box[1], top), max(box[2], right), max(box[3], bottom)]
+    for block in blocks.values():
+        block["text"] = "\n".join(" ".join(words) for words in block["lines"].values())
+    return list(blocks.values())
+
+
+def _mean_confidence(blocks):
+    """Mean word confidence over blocks, or None when no words were recognised"""
+    confs = [conf for block in blocks for conf in block["confs"]]
+    return sum(confs) / len(confs) if confs else None
+
+
+def _tiered_result(blocks, tier):
+    confidence = _mean_confidence(blocks)
+    return {
+        "text": "\n\n".join(block["text"] for block in blocks),
+        "confidence": None if confidence is None else round(confidence, 1),
+        "tier": tier
+    }
+
+
+def _ocr_tiered(img, budget):
+    """OCR a PIL image in tiers and return {"text", "confidence", "tier"}.
+
+    The fast tier reads a grayscale copy downscaled by OCR_FAST_SCALE. If its mean word
+    confidence is below OCR_CONFIDENCE_THRESHOLD but at most half of the text blocks are, only
+    those blocks are re-read from the full-resolution image ("regions"); otherwise the whole page
+    is re-read at full resolution with automatic page segmentation ("accurate").
+    """
+    from PIL import Image
+
+    gray = img.convert("L")
+    fast = gray
+    if OCR_FAST_SCALE < 1:
+        fast = gray.resize(
+            (max(1, round(gray.width * OCR_FAST_SCALE)), max(1, round(gray.height * OCR_FAST_SCALE))),
+            Image.BILINEAR
+        )
+    blocks = _ocr_blocks(fast, TESSERACT_CONFIG, budget)
+    confidence = _mean_confidence(blocks)
+    if confidence is not None and confidence >= OCR_CONFIDENCE_THRESHOLD:
+        return _tiered_result(blocks, "fast")
+
+    weak = [block for block in blocks if sum(block["confs"]) / len(block["confs"]) < OCR_CONFIDENCE_THRESHOLD]
+    if blocks and len(weak) * 2 <= len(blocks):
+        scale = gray.width / fast.width
+        pad = 4 * scale
+        for block in weak:
+            left, top, right, bottom = block["box"]
+            crop = gray.crop((
+                max(0, int(left * scale - pad)),
+                max(0, int(top * scale - pad)),
+                min(gray.width, int(right * scale + pad)),
+                min(gray.height, int(bottom * scale + pad))
+            ))
+            redo = _ocr_blocks(crop, TESSERACT_CONFIG, budget)
+            redo_confidence = _mean_confidence(redo)
+            if redo_confidence is not None and redo_confidence > sum(block["confs"]) / len(block["confs"]):
+                block["text"] = "\n".join(b["text"] for b in redo)
+                block["confs"] = [conf for b in redo for conf in b["confs"]]
+        return _tiered_result(blocks, "regions")
+
+    return _tiered_result(_ocr_blocks(gray, TESSERACT_ACCURATE_CONFIG, budget), "accurate")
+
+
+def _ocr_prepared_tiered(img, scale=1.0, limits=None):
+    """Preprocess then tier-OCR one image; blank pages skip Tesseract and are reported as tier blank"""
+    budget = _Budget(limits)
+    if budget.expired():
+        return {"text": "", "timed_out": True}
+    prepared, info = _prepare_image(img, scale)
+    if prepared is None:
+        return {"text": "", "confidence": None, "tier": "blank", **info}
+    try:
+        return {**_ocr_tiered(prepared, budget), **info}
+    except _PageTimeout:
+        return {"text": "", "timed_out": True, **info}
+
+
+def _ocr_pages_tiered(page_images, limits=None):
+    """Pool task: tiered OCR of a group of rendered pages, one {"text", "confidence", "tier"} per page"""
+    try:
+        from PIL import Image
+
+        results = []
+        for mode, size, samples in page_images:
+            start = time.perf_counter()
+            result = _ocr_prepared_tiered(Image.frombytes(mode, size, samples), limits=limits)
+            result["ocr_ms"] = (time.perf_counter() - start) * 1000
+            results.append(result)
+        return results
+    except Exception as e:
+        raise Exception(f"Error extracting text from image: {str(e)}")
+
+
+def _open_image(source):
+    """Open an image from a path or from its bytes"""
+    from PIL import Image
+
+    if isinstance(source, str):
+        return Image.open(source)
+    return Image.open(io.BytesIO(source))
+
+
+def _ocr_image_file_tiered(image_path, limits=None):
+    """Tiered OCR of an image file; also runs as a pool task for long-lived processors"""
+    try:
+        img = _open_image(image_path)
+        return _ocr_prepared_tiered(img, _image_scale(img), limits)
+    except Exception as e:
+        raise Exception(f"Error extracting text from image: {str(e)}")
+
+
+def _ocr_image_file(image_path, limits=None):
+    """OCR an image file into {"text"}; also runs as a pool task for long-lived processors"""
+    try:
+        budget = _Budget(limits)
+        img = _open_image(image_path)
+        prepared, info = _prepare_image(img, _image_scale(img))
+        if prepared is None:
+            return {"text": "", **info}
+        try:
+            extracted_text = _run_tesseract(_tesseract().image_to_string, prepared, TESSERACT_CONFIG, budget)
+        except _PageTimeout:
+            return {"text": "", "timed_out": True, **info}
+        return {"text": extracted_text.strip(), **info}
+    except Exception as e:
+        raise Exception(f"Error extracting text from image: {str(e)}")
+
+
+def load_source(file_path):
+    """Resolve a job's document: bytes pass through, "shm:NAME[:SIZE]" is read from a named
+    shared-memory block, and anything else must be an existing path on disk"""
+    if not isinstance(file_path, str):
+        return file_path
+    if file_path.startswith("shm:"):
+        return _read_shared_memory(file_path[len("shm:"):])
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+    return file_path
+
+
+def _read_shared_memory(spec):
+    """Copy the first SIZE bytes (default: all) of the shared-memory block NAME[:SIZE]"""
+    from multiprocessing import shared_memory
+
+    name, _, size = spec.partition(":")
+    try:
+        if sys.version_info >= (3, 13):
+            block = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            block = shared_memory.SharedMemory(name=name)
+            if os.name == "posix":
+                # The caller owns the block; keep this process's resource tracker from unlinking it
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(block._name, "shared_memory")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Shared memory block not found: {name}")
+    try:
+        end = int(size) if size else block.size
+        return bytes(block.buf[:end])
+    finally:
+        block.close()
+
+
+def preprocess_settings():
+    """Preprocessing settings, or None when images go to Tesseract unchanged"""
+    if not OCR_PREPROCESS:
+        return None
+    return {
+        "target_dpi": OCR_TARGET_DPI,
+        "max_skew_degrees": OCR_MAX_SKEW_DEGREES,
+        "blank_ink_ratio": OCR_BLANK_INK_RATIO
+    }
+
 
 class OCRProcessor:
-    def __init__(self):
-        self.splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=20)
+    def __init__(self, page_workers=None, max_in_flight=None, pool_images=False):
+        self.chunk_size = 500
+        self.chunk_overlap = 20
+        self.chunker = TextChunker(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+        # Image-only PDF pages are OCR'd on a process pool; 1 keeps everything in-process
+        self.page_workers = page_workers or int(os.environ.get('OCR_PAGE_WORKERS', os.cpu_count() or 1))
+        # Rendered pages waiting for OCR are capped so huge scans don't pile up in memory
+        self.max_in_flight = max_in_flight or int(os.environ.get('OCR_MAX_IN_FLIGHT_PAGES', 2 * self.page_workers))
+        self.tesseract_batch_pages = max(1, OCR_TESSERACT_BATCH_PAGES)
+        self.tiered = OCR_TIERED
+        self.deadline = OCR_DEADLINE_SECONDS
+        self.page_timeout = OCR_PAGE_TIMEOUT_SECONDS
+        self.timings = OCR_TIMINGS
+        # Long-lived processors (serve and batch modes) also send image files to the pool so that
+        # concurrent jobs never run more Tesseract processes than there are page workers
+        self.pool_images = pool_images
+        self._page_pool = None
+        self._pool_lock = threading.Lock()
+        self.result_cache = None
+        if OCR_CACHE_MAX_MB > 0:
+            self.result_cache = _open_cache(
+                os.path.join(OCR_CACHE_DIR, 'results'),
+                int(OCR_CACHE_MAX_MB * 1024 * 1024)
+            )
+        self.page_cache = None
+        if OCR_PAGE_CACHE_MAX_MB > 0:
+            self.page_cache = _open_cache(
+                os.path.join(OCR_CACHE_DIR, 'pages'),
+                int(OCR_PAGE_CACHE_MAX_MB * 1024 * 1024),
+                evict_every=32
+            )
+
+    def cache_settings(self, file_type):
+        """Everything besides the file bytes that changes what process_file returns"""
+        return {
+            "version": RESULT_FORMAT_VERSION,
+            "file_type": file_type,
+            "tesseract_config": TESSERACT_CONFIG,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "tiers": self.tier_settings(),
+            "preprocess": preprocess_settings(),
+            "image_regions": region_settings()
+        }
+
+    def tier_settings(self):
+        """Tiered OCR settings, or None when every page gets a single standard pass"""
+        if not self.tiered:
+            return None
+        return {
+            "render_dpi": OCR_TIER_RENDER_DPI,
+            "fast_scale": OCR_FAST_SCALE,
+            "threshold": OCR_CONFIDENCE_THRESHOLD,
+            "accurate_config": TESSERACT_ACCURATE_CONFIG
+        }
+
+    def job_limits(self, deadline=None, page_timeout=None):
+        """(page timeout, wall-clock deadline) for a job starting now, or None when it has no limits"""
+        deadline = self.deadline if deadline is None else deadline
+        page_timeout = self.page_timeout if page_timeout is None else page_timeout
+        if not deadline and not page_timeout:
+            return None
+        return (page_timeout or None, time.time() + deadline if deadline else None)
+
+    def render_dpi(self):
+        """Resolution image-only PDF pages are rendered at for OCR, or None for PyMuPDF's default"""
+        if self.tiered:
+            return OCR_TIER_RENDER_DPI
+        if OCR_PREPROCESS:
+            return OCR_TARGET_DPI
+        return None
+
+    def get_page_pool(self):
+        """Lazily start the shared page OCR pool"""
+        with self._pool_lock:
+            if self._page_pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._page_pool = ProcessPoolExecutor(
+                    max_workers=self.page_workers,
+                    initializer=_init_page_worker
+                )
+            return self._page_pool
+
+    def close(self):
+        """Shut down the page OCR pool, if one was started"""
+        with self._pool_lock:
+            if self._page_pool is not None:
+                self._page_pool.shutdown()
+                self._page_pool = None
     
     def extract_text_from_image(self, image_path):
         """Extract text from image using OCR"""
+        return self.ocr_image(image_path)["text"]
+
+    def ocr_image(self, image_path, limits=None):
+        """OCR an image file into {"text"}, plus "confidence" and "tier" in tiered mode,
+        "preprocess" timings when preprocessing is on and "timed_out" if limits cut it short"""
+        if self.tiered:
+            task = _ocr_image_file_tiered
+        else:
+            task = _ocr_image_file
+        if self.pool_images and self.page_workers > 1:
+            return self.get_page_pool().submit(task, image_path, limits).result()
+        return task(image_path, limits)
+    
+    def iter_pdf_pages(self, pdf_path, limits=None, pages=None, timer=None):
+        """Yield a {"page", "text", "source"} record for each PDF page, in page order.
+
+        Pages with a text layer are read directly (source "text"). Image-only pages are rendered
+        here and looked up in the page cache by their pixels (source "cache"); the rest are OCR'd
+        in parallel on the page pool (source "ocr"), tesseract_batch_pages pages per Tesseract run
+        and with at most max_in_flight rendered pages outstanding. In tiered mode OCR'd pages also
+        carry "confidence" and "tier".
+
+        Text-layer pages with images their text layer doesn't cover (see _image_regions) keep their
+        text layer and have only those images OCR'd, each at its own resolution (source "mixed").
+        Regions are looked up in the page cache by their pixels too. If their OCR fails, the page
+        keeps its text layer alone (source "text").
+
+        Only page numbers in pages are read, when given. With limits (see job_limits), pages whose
+        OCR timed out and every page not started by the deadline are yielded as
+        {"page", "unprocessed": True} instead. Stage and page times go into timer, a Timings.
+        """
+        import fitz  # PyMuPDF for PDF processing
+
+        timer = timer or Timings()
+        start = time.perf_counter()
+        with _FITZ_LOCK:
+            if isinstance(pdf_path, str):
+                doc = fitz.open(pdf_path)
+            else:
+                doc = fitz.open(stream=pdf_path, filetype="pdf")
+            page_count = len(doc)
+        timer.add("open", start)
+
+        # (record, _PageSlot or None, page cache key or None) for each page not yet yielded
+        ordered = deque()
+        in_flight = set()
+        # Rendered pages waiting to be sent to Tesseract together, with their slots
+        batch_images, batch_slots = [], []
+        # Page cache key -> slot, so repeated pages within one document are only OCR'd once
+        pending_pages = {}
+        # Page cache key -> (slot, position) of an image region being OCR'd, likewise
+        pending_regions = {}
+
+        def submit(task, *args):
+            nonlocal in_flight
+            max_tasks = max(1, self.max_in_flight // self.tesseract_batch_pages)
+            start = time.perf_counter()
+            if len(in_flight) >= max_tasks:
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            future = self._submit_ocr(task, *args, limits)
+            timer.add("ocr_wait", start)
+            in_flight.add(future)
+            return future
+
+        def submit_batch():
+            if not batch_images:
+                return
+            future = submit(_ocr_pages_tiered if self.tiered else _ocr_page_images, list(batch_images))
+            for slot in batch_slots:
+                slot.future = future
+            batch_images.clear()
+            batch_slots.clear()
+
+        deadline_at = limits[1] if limits else None
+        stopped_at = page_count
         try:
-            img = Image.open(image_path)
-            extracted_text = pytesseract.image_to_string(
-                img,
-                config="--oem 1 --psm 6"
-            )
-            return extracted_text.strip()
+            for page_num in range(page_count):
+                # Hand back every leading page that is already finished
+                while ordered and (ordered[0][1] is None or ordered[0][1].done()):
+                    yield self._finish_page(*ordered.popleft(), timer)
+
+                if pages is not None and page_num + 1 not in pages:
+                    continue
+                if deadline_at is not None and time.time() >= deadline_at:
+                    stopped_at = page_num
+                    break
+
+                with _FITZ_LOCK:
+                    page = doc[page_num]
+
+                    # First try to extract text directly
+                    start = time.perf_counter()
+                    page_text = page.get_text()
+                    timer.add("text_layer", start, page_num + 1)
+                    page_image = None
+                    region_images = []
+                    if not page_text.strip():
+                        # If no text found, render the page for OCR
+                        start = time.perf_counter()
+                        page_image = _render_page(page, self.render_dpi())
+                        timer.add("render", start, page_num + 1)
+                    elif OCR_IMAGE_REGIONS:
+                        # Otherwise only images the text layer doesn't already cover need OCR
+                        start = time.perf_counter()
+                        regions = _image_regions(page)
+                        timer.add("regions", start, page_num + 1)
+                        start = time.perf_counter()
+                        region_images = [(_render_page(page, dpi, box), dpi) for box, dpi in regions]
+                        if region_images:
+                            timer.add("render", start, page_num + 1)
+
+                record = {"page": page_num + 1}
+                if region_images:
+                    # Each region's text, or the (slot, position) of its pending OCR
+                    region_texts = []
+                    region_keys, uncached = [], []
+                    slot = None
+                    for region_image, dpi in region_images:
+                        region_key = None
+                        if self.page_cache is not None:
+                            start = time.perf_counter()
+                            region_key = page_cache_key(
+                                region_image,
+                                {
+                                    "tesseract_config": TESSERACT_CONFIG,
+                                    "preprocess": preprocess_settings(),
+                                    "region_dpi": dpi
+                                }
+                            )
+                            cached = self.page_cache.get(region_key)
+                            timer.add("page_cache", start, page_num + 1)
+                            if cached is not None:
+                                region_texts.append(cached["text"])
+                                continue
+                            if region_key in pending_regions:
+                                region_texts.append(pending_regions[region_key])
+                                continue
+                        slot = slot or _PageSlot(0)
+                        region_texts.append((slot, len(uncached)))
+                        if region_key is not None:
+                            pending_regions[region_key] = region_texts[-1]
+                        region_keys.append(region_key)
+                        uncached.append((region_image, dpi))
+                    if slot is not None:
+                        slot.future = submit(_ocr_page_regions, uncached)
+                    record.update(text=page_text, source="mixed", region_texts=region_texts)
+                    ordered.append((record, slot, region_keys))
+                    continue
+                if page_image is None:
+                    record.update(text=page_text, source="text")
+                    ordered.append((record, None, None))
+                    continue
+
+                # Identical pixels (boilerplate exhibits, unchanged pages of a revision) reuse earlier OCR
+                page_key = None
+                if self.page_cache is not None:
+                    start = time.perf_counter()
+                    page_key = page_cache_key(
+                        page_image,
+                        {
+                            "tesseract_config": TESSERACT_CONFIG,
+                            "tiers": self.tier_settings(),
+                            "preprocess": preprocess_settings()
+                        }
+                    )
+                    cached = self.page_cache.get(page_key)
+                    timer.add("page_cache", start, page_num + 1)
+                    if cached is not None:
+                        record.update(cached, source="cache")
+                        ordered.append((record, None, None))
+                        continue
+                    if page_key in pending_pages:
+                        record["source"] = "cache"
+                        ordered.append((record, pending_pages[page_key], None))
+                        continue
+
+                record["source"] = "ocr"
+                slot = _PageSlot(len(batch_images))
+                batch_images.append(page_image)
+                batch_slots.append(slot)
+                if page_key is not None:
+                    pending_pages[page_key] = slot
+                ordered.append((record, slot, page_key))
+                if len(batch_images) >= self.tesseract_batch_pages:
+                    submit_batch()
+
+            submit_batch()
+            while ordered:
+                yield self._finish_page(*ordered.popleft(), timer)
+            for page_num in range(stopped_at, page_count):
+                if pages is None or page_num + 1 in pages:
+                    yield {"page": page_num + 1, "unprocessed": True}
+        finally:
+            for _, slot, _ in ordered:
+                if slot is not None:
+                    slot.cancel()
+            with _FITZ_LOCK:
+                doc.close()
+
+    def _submit_ocr(self, fn, *args):
+        """Run an OCR task on the page pool, or right here when there is only one page worker"""
+        if self.page_workers > 1:
+            return self.get_page_pool().submit(fn, *args)
+        future = Future()
+        try:
+            future.set_result(fn(*args))
         except Exception as e:
-            raise Exception(f"Error extracting text from image: {str(e)}")
-    
-    def extract_text_from_pdf(self, pdf_path):
-        """Extract text from PDF using PyMuPDF"""
+            future.set_exception(e)
+        return future
+
+    def _finish_page(self, record, slot, page_key, timer):
+        """Collect a page's OCR result and store it in the page cache"""
+        if record["source"] == "mixed":
+            return self._finish_mixed_page(record, slot, page_key, timer)
+        if slot is not None:
+            start = time.perf_counter()
+            record.update(slot.result())
+            timer.add("ocr_wait", start, record["page"])
+            ocr_ms = record.pop("ocr_ms", None)
+            # Pages reusing another page's pending OCR didn't cost any of their own
+            if ocr_ms is not None and record["source"] != "cache":
+                timer.add_ms("ocr", ocr_ms, record["page"])
+            if record.get("timed_out"):
+                return {"page": record["page"], "unprocessed": True}
+        if page_key is not None:
+            _cache_store(self.page_cache, page_key, {key: record[key] for key in ("text", "confidence", "tier") if key in record})
+        return record
+
+    def _finish_mixed_page(self, record, slot, region_keys, timer):
+        """Append a mixed page's region texts to its text layer, caching the ones it OCR'd itself"""
+        texts = []
         try:
-            doc = fitz.open(pdf_path)
-            extracted_text = ""
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # First try to extract text directly
-                page_text = page.get_text()
-                
-                if page_text.strip():
-                    extracted_text += f"--- Page {page_num + 1} ---\n{page_text}\n\n"
-                else:
-                    # If no text found, use OCR on the page image
-                    pix = page.get_pixmap()
-                    img_data = pix.tobytes("png")
-                    
-                    # Save temporary image
-                    temp_img_path = f"temp_page_{page_num}.png"
-                    with open(temp_img_path, "wb") as f:
-                        f.write(img_data)
-                    
-                    # Extract text using OCR
-                    page_text = self.extract_text_from_image(temp_img_path)
-                    extracted_text += f"--- Page {page_num + 1} (OCR) ---\n{page_text}\n\n"
-                    
-                    # Clean up temp file
-                    if os.path.exists(temp_img_path):
-                        os.remove(temp_img_path)
-            
-            doc.close()
-            return extracted_text.strip()
+            if slot is not None:
+                start = time.perf_counter()
+                ocr = slot.result()
+                timer.add("ocr_wait", start, record["page"])
+                if "ocr_ms" in ocr:
+                    timer.add_ms("ocr", ocr.pop("ocr_ms"), record["page"])
+                if ocr.get("timed_out"):
+                    return {"page": record["page"], "unprocessed": True}
+                for region_key, text in zip(region_keys, ocr["region_texts"]):
+                    if region_key is not None:
+                        _cache_store(self.page_cache, region_key, {"text": text})
+            for text in record.pop("region_texts"):
+                if isinstance(text, tuple):
+                    # Another page's pending OCR of the same pixels, already finished in page order
+                    other, position = text
+                    text = other.result()["region_texts"][position]
+                texts.append(text)
+        except Exception as e:
+            # Region text is a bonus on top of the text layer, so a failure must not fail the document
+            print(f"Page {record['page']}: image region OCR failed, using its text layer alone: {e}", file=sys.stderr)
+            record.pop("region_texts", None)
+            record["source"] = "text"
+            # Kept out of the result cache, so a later run tries its regions again
+            record["degraded"] = True
+            return record
+        texts = [text for text in texts if text]
+        record["text"] = "\n\n".join([record["text"].rstrip()] + texts) + "\n"
+        record["image_regions"] = len(texts)
+        return record
+
+    def collect_pdf_pages(self, pdf_path, keep_text=True, limits=None, pages=None, timer=None):
+        """Run every PDF page through a _PageText, which chunks each page as it arrives"""
+        timer = timer or Timings()
+        page_text = _PageText(self.chunker, keep_text)
+        try:
+            for record in self.iter_pdf_pages(pdf_path, limits, pages, timer):
+                start = time.perf_counter()
+                page_text.add(record)
+                _time_page(timer, record, start)
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
+        return page_text
+
+    def extract_text_from_pdf(self, pdf_path, page_stats=None, page_spans=None):
+        """Extract text from PDF using PyMuPDF.
+
+        Per-source page counts go into page_stats and (page, start, end) offsets of each page's
+        section of the returned text into page_spans, when those are given.
+        """
+        pages = self.collect_pdf_pages(pdf_path)
+        extracted_text = pages.text()
+        if page_stats is not None:
+            page_stats.update(pages.stats)
+        if page_spans is not None:
+            page_spans.extend(pages.spans)
+        return extracted_text
     
-    def process_file(self, file_path, file_type):
-        """Process file based on type and return extracted text with chunks"""
+    def split_text(self, extracted_text, page_spans=None):
+        """Split extracted text into the chunk records returned to Node, never across pages"""
+        if page_spans is None:
+            page_spans = [(1, 0, len(extracted_text))]
+        return self.chunker.chunk(extracted_text, page_spans)
+    
+    def process_file(self, file_path, file_type, deadline=None, page_timeout=None, pages=None, timings=None):
+        """Process file based on type and return extracted text with chunks.
+
+        file_path may also be the document's bytes or a shm:NAME[:SIZE] reference (see load_source).
+        deadline and page_timeout (seconds) override the processor's defaults; work they cut short
+        makes the result "partial" with its "unprocessed_pages", which can be resumed later by
+        passing those page numbers as pages. timings adds a "timings" block (default OCR_TIMINGS).
+        With OCR_PROFILE_DIR set, the job is profiled and the result says where the dump went.
+        """
+        args = (file_path, file_type, deadline, page_timeout, pages, timings)
+        if not OCR_PROFILE_DIR:
+            return self._process_file(*args)
+        result, profile = profile_job(OCR_PROFILE_DIR, self._process_file, *args)
+        if profile is not None:
+            result["profile"] = profile
+        return result
+
+    def _process_file(self, file_path, file_type, deadline, page_timeout, pages, timings):
+        timer = Timings()
+        if timings is None:
+            timings = self.timings
         try:
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"File not found: {file_path}")
+            limits = self.job_limits(deadline, page_timeout)
+            start = time.perf_counter()
+            file_path = load_source(file_path)
+            timer.add("load", start)
+            
+            # Same bytes with the same settings always produce the same result
+            cache_key = None
+            if self.result_cache is not None and pages is None:
+                start = time.perf_counter()
+                cache_key = file_cache_key(file_path, self.cache_settings(file_type))
+                cached = self.result_cache.get(cache_key)
+                timer.add("cache_lookup", start)
+                if cached is not None:
+                    cached["cache"] = dict(self.result_cache.stats(), hit=True)
+                    # Same shape as a fresh result
+                    cached["memory"] = {"peak_rss_mb": _peak_rss_mb()}
+                    if timings:
+                        cached["timings"] = timer.report(_source_bytes(file_path), {})
+                    return cached
             
             # Extract text based on file type
+            selected_pages = pages
+            pages = None
+            ocr_pages = []
+            preprocess = {}
+            unprocessed = []
+            degraded = []
             if file_type.startswith('image/'):
-                extracted_text = self.extract_text_from_image(file_path)
+                start = time.perf_counter()
+                image = self.ocr_image(file_path, limits)
+                timer.add("ocr", start, 1)
+                extracted_text = image["text"]
+                if image.get("timed_out"):
+                    unprocessed = [1]
+                if "tier" in image:
+                    ocr_pages.append(_ocr_page_info({"page": 1, **image}))
+                _add_preprocess(preprocess, image)
+                start = time.perf_counter()
+                chunks = self.split_text(extracted_text)
+                _time_page(timer, {"page": 1, "source": "ocr", "unprocessed": bool(unprocessed)}, start)
+                word_count = len(extracted_text.split())
             elif file_type == 'application/pdf':
-                extracted_text = self.extract_text_from_pdf(file_path)
+                pages = self.collect_pdf_pages(file_path, limits=limits, pages=selected_pages, timer=timer)
+                start = time.perf_counter()
+                extracted_text = pages.text()
+                timer.add("assemble", start)
+                chunks = pages.chunks
+                word_count = pages.word_count
+                ocr_pages = pages.ocr_pages
+                preprocess = pages.preprocess
+                unprocessed = pages.unprocessed
+                degraded = pages.degraded
             else:
                 raise Exception(f"Unsupported file type: {file_type}")
             
-            # Create LangChain document
-            doc = Document(page_content=extracted_text)
-            
-            # Split into chunks
-            chunks = self.splitter.split_documents([doc])
-            
             # Prepare response
             result = {
                 "success": True,
                 "text": extracted_text,
                 "text_length": len(extracted_text),
-                "word_count": len(extracted_text.split()),
+                "word_count": word_count,
                 "chunk_count": len(chunks),
-                "chunks": [
-                    {
-                        "index": i,
-                        "content": chunk.page_content,
-                        "length": len(chunk.page_content)
-                    }
-                    for i, chunk in enumerate(chunks)
-                ]
+                "chunks": chunks,
+                "partial": bool(unprocessed)
             }
+            if unprocessed:
+                result["unprocessed_pages"] = unprocessed
+            if degraded:
+                result["degraded_pages"] = degraded
+            
+            if pages is not None:
+                result["pages"] = _page_summary(pages.stats, len(unprocessed))
+            if ocr_pages:
+                result["ocr_pages"] = ocr_pages
+            if preprocess:
+                result["preprocess"] = preprocess
+            
+            if cache_key is not None and not unprocessed and not degraded:
+                start = time.perf_counter()
+                _cache_store(self.result_cache, cache_key, result)
+                timer.add("cache_store", start)
+                result["cache"] = dict(self.result_cache.stats(), hit=False)
+            
+            result["memory"] = {"peak_rss_mb": _peak_rss_mb()}
+            if timings:
+                page_stats = pages.stats if pages is not None else {"ocr": 0 if unprocessed else 1}
+                result["timings"] = timer.report(_source_bytes(file_path), page_stats)
             
             return result
             
         except Exception as e:
-            return {
+            return _error_result(e)
+    
+    def process_batch(self, jobs):
+        """Process several (file_path, file_type[, options]) jobs together and return results keyed by file_path.
+
+        options is a dict of process_file keyword arguments (deadline, page_timeout, pages).
+
+        Every file runs on its own thread but all of them feed the one page pool. Each file holds
+        at most max_in_flight pages in the pool's FIFO queue, so pages from different files are
+        interleaved and a batch takes about as long as its largest file rather than the sum.
+        """
+        if not jobs:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(len(jobs), 32)) as executor:
+            futures = [
+                (job[0], executor.submit(self.process_file, *job[:2], **(job[2] if len(job) > 2 else {})))
+                for job in jobs
+            ]
+        return {file_path: future.result() for file_path, future in futures}
+    
+    def process_file_stream(self, file_path, file_type, deadline=None, page_timeout=None, pages=None, timings=None):
+        """Yield NDJSON records for a file: each page as it is extracted followed by its chunks, then a summary.
+
+        Nothing but counts is kept between pages, so memory stays bounded by a few pages however
+        long the document is. Streaming skips the whole-file result cache (image-only pages still
+        use the page cache), since a cached result has no per-page records to replay. Limits work
+        as in process_file, with unprocessed pages streamed as {"type": "page", "page", "unprocessed": true}.
+        timings adds the "timings" block to the summary; time spent writing records out is not counted.
+        """
+        timer = Timings()
+        if timings is None:
+            timings = self.timings
+        try:
+            limits = self.job_limits(deadline, page_timeout)
+            start = time.perf_counter()
+            file_path = load_source(file_path)
+            timer.add("load", start)
+            
+            selected_pages = pages
+            pages = None
+            preprocess = {}
+            unprocessed = []
+            if file_type.startswith('image/'):
+                start = time.perf_counter()
+                image = self.ocr_image(file_path, limits)
+                timer.add("ocr", start, 1)
+                extracted_text = image["text"]
+                _add_preprocess(preprocess, image)
+                if image.get("timed_out"):
+                    unprocessed = [1]
+                    yield {"type": "page", "page": 1, "unprocessed": True}
+                else:
+                    yield {"type": "page", "page": 1, **image, "source": "ocr"}
+                start = time.perf_counter()
+                chunks = self.split_text(extracted_text)
+                _time_page(timer, {"page": 1, "source": "ocr", "unprocessed": bool(unprocessed)}, start)
+                chunk_count = 0
+                for chunk in chunks:
+                    chunk_count += 1
+                    yield {"type": "chunk", **chunk}
+                text_length = len(extracted_text)
+                word_count = len(extracted_text.split())
+            elif file_type == 'application/pdf':
+                pages = _PageText(self.chunker, keep_text=False)
+                try:
+                    for record in self.iter_pdf_pages(file_path, limits, selected_pages, timer):
+                        yield {"type": "page", **record}
+                        start = time.perf_counter()
+                        chunks = pages.add(record)
+                        _time_page(timer, record, start)
+                        for chunk in chunks:
+                            yield {"type": "chunk", **chunk}
+                except Exception as e:
+                    raise Exception(f"Error extracting text from PDF: {str(e)}")
+                chunk_count = pages.chunk_count
+                preprocess = pages.preprocess
+                unprocessed = pages.unprocessed
+                text_length = pages.text_length()
+                word_count = pages.word_count
+            else:
+                raise Exception(f"Unsupported file type: {file_type}")
+            
+            summary = {
+                "type": "summary",
+                "success": True,
+                "text_length": text_length,
+                "word_count": word_count,
+                "chunk_count": chunk_count,
+                "partial": bool(unprocessed)
+            }
+            if unprocessed:
+                summary["unprocessed_pages"] = unprocessed
+            if pages is not None and pages.degraded:
+                summary["degraded_pages"] = pages.degraded
+            if pages is not None:
+                summary["pages"] = _page_summary(pages.stats, len(unprocessed))
+            if preprocess:
+                summary["preprocess"] = preprocess
+            summary["memory"] = {"peak_rss_mb": _peak_rss_mb()}
+            if timings:
+                page_stats = pages.stats if pages is not None else {"ocr": 0 if unprocessed else 1}
+                summary["timings"] = timer.report(_source_bytes(file_path), page_stats)
+            yield summary
+            
+        except Exception as e:
+            summary = _error_result(e)
+            del summary["text"], summary["chunks"]
+            yield {"type": "summary", **summary}
+
+
+class _PageSlot:
+    """One page's place in a (possibly multi-page) OCR task"""
+
+    def __init__(self, index):
+        self.index = index
+        self.future = None
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def result(self):
+        return self.future.result()[self.index]
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+
+
+def _page_section(record):
+    """Format one PDF page record as its --- Page N --- section of the extracted text"""
+    if record["source"] == "text":
+        label = f"Page {record['page']}"
+    elif record["source"] == "mixed":
+        label = f"Page {record['page']} (Text + OCR)"
+    else:
+        label = f"Page {record['page']} (OCR)"
+    return f"--- {label} ---\n{record['text']}\n\n"
+
+
+class _PageText:
+    """Builds the extracted text of a PDF one page at a time.
+
+    Each page's section is chunked as soon as it arrives (chunks never cross pages), so no pass
+    over the full text is needed. The sections are joined into the text once, at the end. With
+    keep_text=False only chunks and counts are produced, for streaming.
+    """
+
+    def __init__(self, chunker, keep_text=True):
+        self.chunker = chunker
+        self.keep_text = keep_text
+        self.keep_chunks = keep_text
+        self.parts = []
+        self.spans = []
+        self.stats = {}
+        self.ocr_pages = []
+        self.unprocessed = []
+        self.degraded = []
+        self.preprocess = {}
+        self.chunks = []
+        self.chunk_count = 0
+        self.length = 0
+        self.word_count = 0
+        self.trailing = 0
+
+    def add(self, record):
+        """Append one page record and return the chunks of its section"""
+        if record.get("unprocessed"):
+            self.unprocessed.append(record["page"])
+            return []
+        if record.get("degraded"):
+            self.degraded.append(record["page"])
+        section = _page_section(record)
+        base = self.length
+        self.spans.append((record["page"], base, base + len(section)))
+        self.stats[record["source"]] = self.stats.get(record["source"], 0) + 1
+        if "tier" in record:
+            self.ocr_pages.append(_ocr_page_info(record))
+        _add_preprocess(self.preprocess, record)
+
+        chunks = []
+        for chunk in self.chunker.chunk_span(section, 0, len(section), record["page"]):
+            chunk["startIndex"] += base
+            chunk["endIndex"] += base
+            chunks.append({"index": self.chunk_count, **chunk})
+            self.chunk_count += 1
+        if self.keep_chunks:
+            self.chunks.extend(chunks)
+
+        self.length += len(section)
+        self.word_count += len(section.split())
+        self.trailing = len(section) - len(section.rstrip())
+
+        if self.keep_text:
+            self.parts.append(section)
+        return chunks
+
+    def text_length(self):
+        return self.length - self.trailing
+
+    def text(self):
+        """Assemble the sections once; only trailing whitespace is stripped, so offsets still hold"""
+        if self.parts and self.trailing:
+            # Trim the last section rather than slicing a second copy of the whole text
+            self.parts[-1] = self.parts[-1][:len(self.parts[-1]) - self.trailing]
+        extracted_text = "".join(self.parts)
+        self.parts = []
+        self.spans = [(page, start, min(end, len(extracted_text))) for page, start, end in self.spans]
+        return extracted_text
+
+
+def _time_page(timer, record, start):
+    """Charge a page's chunking (the time since start) to timer and note where its text came from"""
+    timer.add("chunking", start, record["page"])
+    timer.page(record["page"])["source"] = "unprocessed" if record.get("unprocessed") else record["source"]
+
+
+def _source_bytes(source):
+    """Size of a loaded source (document bytes or a path) in bytes"""
+    return len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
+
+def _page_summary(page_stats, unprocessed=0):
+    """Turn per-source page counts into the pages block of a result"""
+    return {
+        "total": sum(page_stats.values()) + unprocessed,
+        "text_layer": page_stats.get("text", 0),
+        "ocr": page_stats.get("ocr", 0),
+        "mixed": page_stats.get("mixed", 0),
+        "reused": page_stats.get("cache", 0),
+        "unprocessed": unprocessed
+    }
+
+
+def _ocr_page_info(record):
+    """Per-page entry of a result's ocr_pages list in tiered mode"""
+    return {"page": record["page"], "confidence": record["confidence"], "tier": record["tier"]}
+
+
+def _add_preprocess(totals, record):
+    """Add one page's preprocessing timings to the preprocess block of a result"""
+    if "preprocess" not in record:
+        return
+    if not totals:
+        totals.update(pages=0, blank_pages=0, ms={})
+    totals["pages"] += 1
+    totals["blank_pages"] += 1 if record.get("blank") else 0
+    for step, ms in record["preprocess"].items():
+        step = step[:-len("_ms")]
+        totals["ms"][step] = round(totals["ms"].get(step, 0) + ms, 2)
+
+
+def _peak_rss_mb():
+    """High-water mark of this process's resident memory in MB, or None where it can't be read"""
+    # On Linux ru_maxrss survives exec, so a child spawned by a large process (Node, a benchmark)
+    # would report its parent's peak; VmHWM only covers this process image
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def _error_result(error):
+    """Result returned to Node when processing fails"""
+    return {
+        "success": False,
+        "error": str(error),
+        "text": "",
+        "text_length": 0,
+        "word_count": 0,
+        "chunk_count": 0,
+        "chunks": []
+    }
+
+
+class OCRWorker:
+    """Long-lived OCR worker that keeps one warm OCRProcessor and serves NDJSON jobs"""
+
+    def __init__(self, workers=None):
+        self.processor = OCRProcessor(pool_images=True)
+        self.workers = workers or int(os.environ.get('OCR_WORKERS', os.cpu_count() or 1))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def handle_line(self, line):
+        """Run a single job line ({"id", "file_path", "file_type"}, optionally "format": "compact") and return the response dict"""
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get('id')
+            result = self.processor.process_file(job['file_path'], job['file_type'], **job_options(job))
+            if job.get('format') == 'compact':
+                result = compact_result(result)
+        except Exception as e:
+            result = {
                 "success": False,
-                "error": str(e),
-                "text": "",
-                "text_length": 0,
-                "word_count": 0,
-                "chunk_count": 0,
-                "chunks": []
+                "error": f"Invalid job: {str(e)}"
             }
+        result["id"] = job_id
+        return result
+
+    def serve_stream(self, in_stream, out_stream):
+        """Read jobs from in_stream and write one JSON result line per job as each one finishes"""
+        write_lock = threading.Lock()
+
+        def run(line):
+            response = json.dumps(self.handle_line(line))
+            with write_lock:
+                out_stream.write(response + "\n")
+                out_stream.flush()
+
+        pending = []
+        for line in in_stream:
+            if not line.strip():
+                continue
+            pending = [f for f in pending if not f.done()]
+            pending.append(self.executor.submit(run, line))
+
+        # Drain outstanding jobs before returning on EOF
+        for future in pending:
+            future.result()
+
+    def serve_socket(self, socket_path):
+        """Serve jobs over a Unix socket, one thread per connected caller"""
+        import socketserver
+
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                reader = (line.decode('utf-8') for line in self.rfile)
+                writer = _SocketWriter(self.wfile)
+                worker.serve_stream(reader, writer)
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+            server.daemon_threads = True
+            server.serve_forever()
+
+
+class _SocketWriter:
+    """Text adapter over a socket's binary write file"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text):
+        self.wfile.write(text.encode('utf-8'))
+
+    def flush(self):
+        self.wfile.flush()
+
+
+def serve(argv):
+    """Run ocr.py as a persistent worker: --serve [--socket PATH] [--workers N]"""
+    socket_path = None
+    workers = None
+    if '--socket' in argv:
+        socket_path = argv[argv.index('--socket') + 1]
+    if '--workers' in argv:
+        workers = int(argv[argv.index('--workers') + 1])
+
+    worker = OCRWorker(workers=workers)
+    if socket_path:
+        worker.serve_socket(socket_path)
+    else:
+        worker.serve_stream(sys.stdin, sys.stdout)
+
+
+def parse_pages(spec):
+    """Page selection for resuming a partial result: a list of page numbers or a "1,4-6" string"""
+    if spec is None:
+        return None
+    if not isinstance(spec, str):
+        return set(int(page) for page in spec)
+    pages = set()
+    for part in spec.split(','):
+        first, _, last = part.strip().partition('-')
+        pages.update(range(int(first), int(last or first) + 1))
+    return pages
+
+
+def job_options(job):
+    """process_file keyword arguments from the optional "deadline", "page_timeout", "pages" and "timings" of a job"""
+    options = {}
+    for key in ('deadline', 'page_timeout'):
+        if job.get(key) is not None:
+            options[key] = float(job[key])
+    if job.get('pages') is not None:
+        options['pages'] = parse_pages(job['pages'])
+    if job.get('timings') is not None:
+        options['timings'] = job['timings'] in (True, 'true', '1')
+    return options
+
+
+def run_batch():
+    """Run ocr.py --batch: read a JSON list of {"file_path", "file_type"} jobs from stdin"""
+    try:
+        jobs = [(job['file_path'], job['file_type'], job_options(job)) for job in json.load(sys.stdin)]
+    except Exception as e:
+        print(json.dumps({"success": False, "error": f"Invalid batch: {str(e)}", "results": {}}))
+        sys.stdout.flush()
+        return
+
+    processor = OCRProcessor(pool_images=True)
+    try:
+        results = processor.process_batch(jobs)
+    finally:
+        processor.close()
+
+    print(json.dumps({
+        "success": any(result["success"] for result in results.values()),
+        "results": results
+    }))
+    sys.stdout.flush()
+
 
 def main():
     """Main function to handle command line arguments"""
-    if len(sys.argv) < 3:
+    if '--startup-profile' in sys.argv[1:]:
+        from startup_profile import profile_startup
+        report = profile_startup(os.path.abspath(__file__), STARTUP_PROFILE_MODULES, STARTUP_BUDGET_MS)
+        print(json.dumps(report, indent=2))
+        sys.stdout.flush()
+        sys.exit(0 if report["within_budget"] else 1)
+
+    if '--serve' in sys.argv[1:]:
+        serve(sys.argv[1:])
+        return
+
+    if '--batch' in sys.argv[1:]:
+        run_batch()
+        return
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    # --name=value flags: --format, and --deadline, --page-timeout and --pages (see job_options)
+    flags = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    if '--timings' in sys.argv[1:]:
+        flags['timings'] = 'true'
+    result_format = flags.pop('format', 'json')
+    try:
+        options = job_options({key.replace('-', '_'): value for key, value in flags.items()})
+    except ValueError:
+        options = None
+    if len(args) < 2 or result_format not in RESULT_FORMATS or options is None:
         result = {
             "success": False,
-            "error": "Usage: python ocr.py <file_path> <file_type>"
+            "error": "Usage: python ocr.py <file_path|-|shm:NAME[:SIZE]> <file_type> [--stream | --format=json|compact|binary] [--deadline=S] [--page-timeout=S] [--pages=1,4-6] [--timings] | python ocr.py --batch < jobs.json | python ocr.py --serve [--socket PATH] [--workers N] | python ocr.py --startup-profile"
         }
         print(json.dumps(result))
         sys.stdout.flush()
         return
     
-    file_path = sys.argv[1]
-    file_type = sys.argv[2]
+    file_path = args[0]
+    file_type = args[1]
+    if file_path == '-':
+        # Document bytes piped on stdin instead of a path on disk
+        file_path = sys.stdin.buffer.read()
     
     processor = OCRProcessor()
-    result = processor.process_file(file_path, file_type)
+    try:
+        if '--stream' in sys.argv[1:]:
+            # One JSON line per page, then per chunk, then a summary line
+            for record in processor.process_file_stream(file_path, file_type, **options):
+                print(json.dumps(record))
+                sys.stdout.flush()
+            return
+
+        result = processor.process_file(file_path, file_type, **options)
+    finally:
+        processor.close()
+    
+    if result_format == 'binary':
+        sys.stdout.buffer.write(encode_binary(result))
+        sys.stdout.buffer.flush()
+        return
+    if result_format == 'compact':
+        result = compact_result(result)
     
-    # Output JSON result for Node.js to capture
-    print(json.dumps(result))
+    # Output JSON result for Node.js to capture, encoded straight to stdout
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
     sys.stdout.flush()
 
 if __name__ == "__main__":
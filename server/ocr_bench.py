@@ -0,0 +1,544 @@
+"""Benchmarks for the OCR pipeline in ocr.py.
+
+Usage:
+    python ocr_bench.py pixmap [--pages N] [--ocr]
+    python ocr_bench.py chunker [--mb N]
+    python ocr_bench.py result-format [--mb N | --file PATH --type MIME]
+    python ocr_bench.py tesseract-batch [--pages N] [--batch-sizes 1,8] [--workers N]
+    python ocr_bench.py suite [--kinds text,scanned,mixed,photo] [--sizes 1,10,100,500] [--photos N] [--workers N] [--runs N]
+
+Every benchmark prints a JSON report on stdout so runs can be diffed between releases.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF for PDF processing
+import numpy as np
+from PIL import Image, ImageDraw
+
+import ocr
+from ocr_chunker import TextChunker
+from ocr_format import compact_result, decode_binary, encode_binary, expand_compact
+
+CONTRACT_LINES = [
+    "THIS AGREEMENT is made and entered into as of the Effective Date by and between",
+    "the Disclosing Party and the Receiving Party (each a \"Party\").",
+    "1. Confidential Information. The Receiving Party shall hold in strict confidence",
+    "all information disclosed by the Disclosing Party and shall not disclose it",
+    "to any third party without prior written consent.",
+    "2. Term. This Agreement shall remain in effect for a period of two (2) years.",
+    "3. Governing Law. This Agreement shall be governed by the laws of the State.",
+    "IN WITNESS WHEREOF, the Parties have executed this Agreement as of the date above.",
+]
+
+
+def make_page_image(page_number, width=1240, height=1754):
+    """Draw a deterministic contract-like page (A4 at 150 dpi) as a PIL image"""
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    y = 80
+    draw.text((80, y), f"Page {page_number}", fill="black")
+    while y < height - 120:
+        y += 40
+        line = CONTRACT_LINES[(y // 40 + page_number) % len(CONTRACT_LINES)]
+        draw.text((80, y), line, fill="black")
+    return img
+
+
+def make_scanned_pdf(pages):
+    """Build an image-only PDF in memory, one rasterised contract page per PDF page"""
+    doc = fitz.open()
+    for page_number in range(1, pages + 1):
+        buffer = io.BytesIO()
+        make_page_image(page_number).save(buffer, format="PNG")
+        page = doc.new_page(width=595, height=842)
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    return doc
+
+
+# Bump whenever the suite's synthetic documents change, so reports from different corpora aren't compared
+CORPUS_VERSION = 1
+SUITE_KINDS = ["text", "scanned", "mixed", "photo"]
+# A 12 MP phone camera in portrait
+PHOTO_SIZE = (3024, 4032)
+FILE_TYPES = {".pdf": "application/pdf", ".jpg": "image/jpeg"}
+
+
+def add_text_page(doc, page_number):
+    """Add a page with a real text layer, laid out like make_page_image"""
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((38, 38), f"Page {page_number}", fontsize=9)
+    for line_number in range(1, 41):
+        line = CONTRACT_LINES[(line_number + page_number) % len(CONTRACT_LINES)]
+        page.insert_text((38, 38 + 19 * line_number), line, fontsize=9)
+
+
+def add_scanned_page(doc, page_number):
+    """Add an image-only page: a grayscale 150 dpi scan of a contract page"""
+    buffer = io.BytesIO()
+    make_page_image(page_number).convert("L").save(buffer, format="PNG")
+    page = doc.new_page(width=595, height=842)
+    page.insert_image(page.rect, stream=buffer.getvalue())
+
+
+def make_suite_pdf(kind, pages, path):
+    """Write a text, scanned or mixed (odd pages text, even pages scanned) PDF of the given length"""
+    doc = fitz.open()
+    for page_number in range(1, pages + 1):
+        if kind == "text" or (kind == "mixed" and page_number % 2):
+            add_text_page(doc, page_number)
+        else:
+            add_scanned_page(doc, page_number)
+    # No fresh document ID or timestamps, so the same corpus version always has the same bytes
+    doc.set_metadata({})
+    doc.save(path, garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+
+
+def make_photo(index, path):
+    """Write a phone photo of a contract page: upscaled, slightly rotated, on a desk, with sensor noise"""
+    rng = np.random.default_rng(index)
+    desk = (96, 84, 72)
+    page = make_page_image(index).resize((2232, 3157), Image.BICUBIC)
+    page = page.rotate(float(rng.uniform(-3, 3)), resample=Image.BICUBIC, expand=True, fillcolor=desk)
+    photo = Image.new("RGB", PHOTO_SIZE, desk)
+    photo.paste(page, ((PHOTO_SIZE[0] - page.width) // 2, (PHOTO_SIZE[1] - page.height) // 2))
+    pixels = np.asarray(photo, dtype=np.int16) + rng.normal(0, 6, (PHOTO_SIZE[1], PHOTO_SIZE[0], 1)).astype(np.int16)
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, format="JPEG", quality=90)
+
+
+def build_corpus(directory, kinds, sizes, photos):
+    """Create any missing suite documents in directory and return their (name, kind, pages) list"""
+    os.makedirs(directory, exist_ok=True)
+    documents = []
+    for kind in kinds:
+        if kind == "photo":
+            entries = [(f"photo-{index}.jpg", 1, index) for index in range(1, photos + 1)]
+        else:
+            entries = [(f"{kind}-{pages}.pdf", pages, None) for pages in sizes]
+        for name, pages, index in entries:
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                # Write next to the final name first, so an interrupted build never leaves half a file
+                partial = path + ".partial"
+                if kind == "photo":
+                    make_photo(index, partial)
+                else:
+                    make_suite_pdf(kind, pages, partial)
+                os.replace(partial, path)
+            documents.append((name, kind, pages))
+    return documents
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def bench_suite_job(args):
+    """Run one suite document through OCRProcessor.process_file, in a process of its own"""
+    processor = ocr.OCRProcessor(page_workers=args.workers)
+    processor.result_cache = None
+    processor.page_cache = None
+    try:
+        start = time.perf_counter()
+        result = processor.process_file(args.path, args.type, timings=True)
+        elapsed = time.perf_counter() - start
+    finally:
+        processor.close()
+    if not result["success"]:
+        return {"success": False, "error": result["error"]}
+    timings = result["timings"]
+    return {
+        "success": True,
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": result["memory"]["peak_rss_mb"],
+        "chunking_ms": timings["stages"].get("chunking", 0),
+        "text_layer_pages": timings["text_layer_pages"],
+        "ocr_pages": timings["ocr_pages"],
+        "chunk_count": result["chunk_count"],
+        "word_count": result["word_count"],
+        "stages": timings["stages"],
+    }
+
+
+def bench_suite(args):
+    """Time process_file over the synthetic corpus: text, scanned and mixed PDFs and phone photos"""
+    directory = args.corpus or os.path.join(tempfile.gettempdir(), f"legal-ai-ocr-bench-v{CORPUS_VERSION}")
+    documents = build_corpus(directory, args.kinds, args.sizes, args.photos)
+
+    processor = ocr.OCRProcessor(page_workers=args.workers)
+    report = {
+        "benchmark": "suite",
+        "corpus_version": CORPUS_VERSION,
+        "environment": {
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "tesseract": str(ocr._tesseract().get_tesseract_version()),
+            "cpu_count": os.cpu_count(),
+            "page_workers": processor.page_workers,
+            "tesseract_batch_pages": processor.tesseract_batch_pages,
+            "settings": {key: value for key, value in processor.cache_settings(None).items() if key != "file_type"},
+        },
+        "documents": [],
+    }
+
+    for name, kind, pages in documents:
+        path = os.path.join(directory, name)
+        command = [
+            sys.executable, os.path.abspath(__file__), "suite-job", path, FILE_TYPES[os.path.splitext(name)[1]],
+            "--workers", str(processor.page_workers)
+        ]
+        runs = []
+        for _ in range(args.runs):
+            # A fresh process per run keeps peak RSS per document and every run equally cold
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            # The report is the last line; native libraries may write warnings to stdout before it
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        size = os.path.getsize(path)
+        entry = {"name": name, "kind": kind, "pages": pages, "bytes": size, "sha256": _sha256(path)}
+        if not all(run["success"] for run in runs):
+            entry.update(success=False, error=next(run["error"] for run in runs if not run["success"]))
+        else:
+            best = min(runs, key=lambda run: run["seconds"])
+            entry.update(
+                success=True,
+                seconds=best["seconds"],
+                pages_per_sec=round(pages / best["seconds"], 2),
+                mb_per_sec=round(size / 1024 / 1024 / best["seconds"], 3),
+                **{key: value for key, value in best.items() if key not in ("success", "seconds")}
+            )
+        report["documents"].append(entry)
+    return report
+
+
+def bench_pixmap(args):
+    """Compare the old PNG + temp-file page hand-off with passing raw samples to PIL, and the
+    input file pytesseract writes for Tesseract: PNG (an image with no format) or uncompressed PPM"""
+    from pytesseract import pytesseract
+
+    doc = make_scanned_pdf(args.pages)
+    png_ms, raw_ms = [], []
+    # Tesseract input as pytesseract writes it, and whole image_to_string calls with --ocr, by format
+    input_ms = {"png": [], "ppm": []}
+    ocr_ms = {"png": [], "ppm": []}
+
+    for page in doc:
+        # Previous path: PNG encode, write to disk, re-open and decode
+        start = time.perf_counter()
+        img_data = page.get_pixmap().tobytes("png")
+        fd, temp_img_path = tempfile.mkstemp(suffix=".png")
+        with os.fdopen(fd, "wb") as f:
+            f.write(img_data)
+        img = Image.open(temp_img_path)
+        img.load()
+        os.remove(temp_img_path)
+        png_ms.append((time.perf_counter() - start) * 1000)
+
+        # Current path: raw samples straight into PIL
+        start = time.perf_counter()
+        mode, size, samples = ocr._render_page(page)
+        img = Image.frombytes(mode, size, samples)
+        raw_ms.append((time.perf_counter() - start) * 1000)
+
+        for name, image_format in (("png", None), ("ppm", "PPM")):
+            img.format = image_format
+            start = time.perf_counter()
+            with pytesseract.save(img):
+                pass
+            input_ms[name].append((time.perf_counter() - start) * 1000)
+            if args.ocr:
+                img.format = image_format
+                start = time.perf_counter()
+                ocr._tesseract().image_to_string(img, config=ocr.TESSERACT_CONFIG)
+                ocr_ms[name].append((time.perf_counter() - start) * 1000)
+
+    def mean(values):
+        return round(sum(values) / len(values), 3)
+
+    report = {
+        "benchmark": "pixmap",
+        "pages": args.pages,
+        "png_tempfile_ms_per_page": mean(png_ms),
+        "raw_samples_ms_per_page": mean(raw_ms),
+    }
+    report["saved_ms_per_page"] = round(
+        report["png_tempfile_ms_per_page"] - report["raw_samples_ms_per_page"], 3
+    )
+    report["tesseract_input_png_ms_per_page"] = mean(input_ms["png"])
+    report["tesseract_input_ppm_ms_per_page"] = mean(input_ms["ppm"])
+    if args.ocr:
+        report["image_to_string_png_ms_per_page"] = mean(ocr_ms["png"])
+        report["image_to_string_ppm_ms_per_page"] = mean(ocr_ms["ppm"])
+    return report
+
+
+def bench_tesseract_batch(args):
+    """Time a scanned PDF end to end with one Tesseract run per page vs per group of pages"""
+    doc = make_scanned_pdf(args.pages)
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    doc.save(pdf_path)
+    doc.close()
+
+    report = {"benchmark": "tesseract-batch", "pages": args.pages, "workers": args.workers, "runs": {}}
+    baseline = None
+    try:
+        for batch_pages in args.batch_sizes:
+            processor = ocr.OCRProcessor(page_workers=args.workers)
+            processor.page_cache = None
+            processor.tesseract_batch_pages = batch_pages
+            try:
+                start = time.perf_counter()
+                pages = processor.collect_pdf_pages(pdf_path)
+                elapsed = time.perf_counter() - start
+                text = pages.text()
+            finally:
+                processor.close()
+            if baseline is None:
+                baseline = text
+            report["runs"][str(batch_pages)] = {
+                "seconds": round(elapsed, 2),
+                "pages_per_sec": round(args.pages / elapsed, 2),
+                "matches_first": text == baseline,
+            }
+    finally:
+        os.remove(pdf_path)
+    return report
+
+
+def make_contract_text(size_bytes, page_chars=3000):
+    """Deterministic multi-page contract text in the --- Page N --- layout, with its page spans"""
+    parts, spans = [], []
+    length = 0
+    page_number = 0
+    while length < size_bytes:
+        page_number += 1
+        paragraphs = []
+        body_length = 0
+        line = 0
+        while body_length < page_chars:
+            paragraph = " ".join(
+                CONTRACT_LINES[(page_number + line + i) % len(CONTRACT_LINES)] for i in range(3)
+            )
+            paragraphs.append(paragraph)
+            body_length += len(paragraph) + 2
+            line += 1
+        section = f"--- Page {page_number} ---\n" + "\n\n".join(paragraphs) + "\n\n"
+        spans.append((page_number, length, length + len(section)))
+        parts.append(section)
+        length += len(section)
+    return "".join(parts), spans
+
+
+def _best_of(runs, fn):
+    """Fastest of several timed runs in ms, plus the last return value"""
+    best, value = None, None
+    for _ in range(runs):
+        start = time.perf_counter()
+        value = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 2), value
+
+
+def bench_chunker(args):
+    """Compare TextChunker with LangChain's CharacterTextSplitter on a large contract text"""
+    text, spans = make_contract_text(int(args.mb * 1024 * 1024))
+    chunker = TextChunker(chunk_size=500, chunk_overlap=20)
+    native_ms, native_chunks = _best_of(args.runs, lambda: chunker.chunk(text))
+    paged_ms, paged_chunks = _best_of(args.runs, lambda: chunker.chunk(text, spans))
+
+    report = {
+        "benchmark": "chunker",
+        "text_bytes": len(text.encode("utf-8")),
+        "pages": len(spans),
+        "native_ms": native_ms,
+        "native_chunks": len(native_chunks),
+        "native_paged_ms": paged_ms,
+        "native_paged_chunks": len(paged_chunks),
+        "native_mb_per_sec": round(len(text) / 1024 / 1024 / (native_ms / 1000), 2),
+    }
+
+    try:
+        from langchain_core.documents import Document
+        from langchain_text_splitters import CharacterTextSplitter
+    except ImportError:
+        report["langchain_ms"] = None
+        return report
+
+    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=20)
+    langchain_ms, langchain_chunks = _best_of(
+        args.runs, lambda: splitter.split_documents([Document(page_content=text)])
+    )
+    report["langchain_ms"] = langchain_ms
+    report["langchain_chunks"] = len(langchain_chunks)
+    report["matches_langchain"] = [c.page_content for c in langchain_chunks] == [
+        c["content"] for c in native_chunks
+    ]
+    report["speedup"] = round(langchain_ms / native_ms, 2)
+    return report
+
+
+# Parses each payload file named on the command line the way ocr.service.python.js does
+NODE_PARSE_SCRIPT = """
+import fs from 'fs';
+import { pathToFileURL } from 'url';
+const { expandCompactResult, decodeBinaryResult } = await import(pathToFileURL(process.argv[1]).href);
+const [runs, jsonPath, compactPath, binaryPath] = [Number(process.argv[2]), ...process.argv.slice(3)];
+const best = (fn) => {
+    let fastest = Infinity;
+    for (let i = 0; i < runs; i++) {
+        const start = process.hrtime.bigint();
+        fn();
+        fastest = Math.min(fastest, Number(process.hrtime.bigint() - start) / 1e6);
+    }
+    return Math.round(fastest * 100) / 100;
+};
+const json = fs.readFileSync(jsonPath);
+const compact = fs.readFileSync(compactPath);
+const binary = fs.readFileSync(binaryPath);
+console.log(JSON.stringify({
+    json: best(() => JSON.parse(json.toString())),
+    compact: best(() => expandCompactResult(JSON.parse(compact.toString()))),
+    binary: best(() => decodeBinaryResult(binary))
+}));
+"""
+
+
+def bench_result_format(args):
+    """Compare payload size and parse time of the json, compact and binary result formats"""
+    if args.file:
+        processor = ocr.OCRProcessor()
+        processor.result_cache = None
+        try:
+            result = processor.process_file(args.file, args.type)
+        finally:
+            processor.close()
+        if not result["success"]:
+            raise SystemExit(result["error"])
+    else:
+        text, spans = make_contract_text(int(args.mb * 1024 * 1024))
+        chunks = TextChunker(chunk_size=500, chunk_overlap=20).chunk(text, spans)
+        result = {
+            "success": True,
+            "text": text,
+            "text_length": len(text),
+            "word_count": len(text.split()),
+            "chunk_count": len(chunks),
+            "chunks": chunks
+        }
+
+    payloads = {
+        "json": json.dumps(result).encode("utf-8"),
+        "compact": json.dumps(compact_result(result)).encode("utf-8"),
+        "binary": encode_binary(result),
+    }
+    decoders = {
+        "json": json.loads,
+        "compact": lambda data: expand_compact(json.loads(data)),
+        "binary": decode_binary,
+    }
+    report = {
+        "benchmark": "result-format",
+        "source": args.file or f"synthetic {args.mb} MB",
+        "text_bytes": len(result["text"].encode("utf-8")),
+        "chunks": result["chunk_count"],
+        "bytes": {name: len(data) for name, data in payloads.items()},
+        "python_parse_ms": {
+            name: _best_of(args.runs, lambda: decoders[name](data))[0]
+            for name, data in payloads.items()
+        },
+    }
+
+    node = shutil.which("node")
+    if node is None:
+        report["node_parse_ms"] = None
+        return report
+    with tempfile.TemporaryDirectory(prefix="ocr_format_") as payload_dir:
+        paths = []
+        for name, data in payloads.items():
+            path = os.path.join(payload_dir, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+        decoder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "ocrResultFormat.js")
+        output = subprocess.run(
+            [node, "--input-type=module", "-e", NODE_PARSE_SCRIPT, decoder, str(args.runs), *paths],
+            capture_output=True, text=True, check=True
+        ).stdout
+    report["node_parse_ms"] = json.loads(output)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    pixmap = subparsers.add_parser("pixmap", help="page image hand-off cost per page")
+    pixmap.add_argument("--pages", type=int, default=20)
+    pixmap.add_argument("--ocr", action="store_true", help="also time whole image_to_string calls on each page")
+    pixmap.set_defaults(run=bench_pixmap)
+
+    batch = subparsers.add_parser("tesseract-batch", help="per-page vs batched Tesseract runs")
+    batch.add_argument("--pages", type=int, default=50)
+    batch.add_argument(
+        "--batch-sizes", type=lambda v: [int(n) for n in v.split(",")], default=[1, 8],
+        help="comma-separated pages per Tesseract run; the first is the baseline"
+    )
+    batch.add_argument("--workers", type=int, default=1, help="page OCR processes")
+    batch.set_defaults(run=bench_tesseract_batch)
+
+    result_format = subparsers.add_parser("result-format", help="json vs compact vs binary result payloads")
+    result_format.add_argument("--mb", type=float, default=2.0, help="size of the synthetic text")
+    result_format.add_argument("--file", help="extract a real document instead of synthetic text")
+    result_format.add_argument("--type", default="application/pdf", help="MIME type of --file")
+    result_format.add_argument("--runs", type=int, default=5)
+    result_format.set_defaults(run=bench_result_format)
+
+    chunker = subparsers.add_parser("chunker", help="TextChunker vs LangChain on a large text")
+    chunker.add_argument("--mb", type=float, default=2.0, help="size of the synthetic text")
+    chunker.add_argument("--runs", type=int, default=3)
+    chunker.set_defaults(run=bench_chunker)
+
+    suite = subparsers.add_parser("suite", help="process_file over a synthetic corpus of contracts")
+    suite.add_argument(
+        "--kinds", type=lambda v: v.split(","), default=SUITE_KINDS,
+        help="comma-separated document kinds: " + ",".join(SUITE_KINDS)
+    )
+    suite.add_argument(
+        "--sizes", type=lambda v: [int(n) for n in v.split(",")], default=[1, 10, 100, 500],
+        help="comma-separated page counts of the PDFs"
+    )
+    suite.add_argument("--photos", type=int, default=3, help="number of phone-photo JPEGs")
+    suite.add_argument("--corpus", help="directory the documents are generated into and reused from")
+    suite.add_argument("--workers", type=int, help="page OCR processes (default: OCR_PAGE_WORKERS)")
+    suite.add_argument("--runs", type=int, default=1, help="runs per document; the fastest is reported")
+    suite.set_defaults(run=bench_suite)
+
+    suite_job = subparsers.add_parser("suite-job", help="run one suite document (used by suite)")
+    suite_job.add_argument("path")
+    suite_job.add_argument("type")
+    suite_job.add_argument("--workers", type=int)
+    suite_job.set_defaults(run=bench_suite_job, indent=None)
+
+    parser.set_defaults(indent=2)
+    args = parser.parse_args()
+    print(json.dumps(args.run(args), indent=args.indent))
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
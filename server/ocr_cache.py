@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class DiskCache:
+    """Size-bounded LRU cache of JSON values on disk, safe to share between worker processes.
+
+    Each entry is one file named after its key. Writes go to a temp file and are renamed into
+    place, so readers never see a partial entry. A hit bumps the file's mtime, and eviction
+    removes the oldest files until the directory is back under max_bytes. Eviction walks the
+    whole directory, so it runs on each process's first write and then every evict_every writes.
+    A short-lived process (one per upload) therefore still enforces the limit once.
+    """
+
+    def __init__(self, directory, max_bytes, evict_every=1):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._stats_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing, evicted by another worker mid-read, or unreadable: all count as a miss
+            self._count(False)
+            return None
+        self._count(True)
+        return value
+
+    def set(self, key, value):
+        """Atomically store value under key, evicting down to the size limit when due"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._stats_lock:
+            self._writes += 1
+            due = self._writes == 1 or self._writes % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Already evicted by a concurrent worker
+                pass
+            total -= size
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def file_cache_key(source, settings):
+    """SHA-256 of the file bytes (read from a path, or given directly) plus the settings that shape the result"""
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    else:
+        digest.update(source)
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def page_cache_key(page_image, settings):
+    """SHA-256 of a rendered page's raw pixels plus the OCR settings applied to them"""
+    mode, size, samples = page_image
+    digest = hashlib.sha256()
+    digest.update(f"{mode}:{size[0]}x{size[1]}:".encode("utf-8"))
+    digest.update(samples)
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,87 @@
+from collections import deque
+
+
+class TextChunker:
+    """Single-pass replacement for LangChain's CharacterTextSplitter that keeps source offsets.
+
+    Text is split on separator and the pieces are merged greedily up to chunk_size, with up to
+    chunk_overlap characters carried into the next chunk, using the same size accounting as
+    CharacterTextSplitter. On a single page without runs of three or more newlines the chunks match
+    it. Where such runs occur, CharacterTextSplitter strips the pieces and rejoins them with one
+    separator, while every chunk here stays a slice of the source text, so contents and boundaries
+    can differ. Chunks never cross a page boundary, and the work is linear in the text length.
+    """
+
+    def __init__(self, chunk_size=500, chunk_overlap=20, separator="\n\n"):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separator = separator
+
+    def _pieces(self, text, start, end):
+        """Yield (start, end) of each non-empty separator-delimited piece of text[start:end]"""
+        sep_len = len(self.separator)
+        position = start
+        while position <= end:
+            found = text.find(self.separator, position, end)
+            piece_end = end if found == -1 else found
+            if piece_end > position:
+                yield position, piece_end
+            if found == -1:
+                break
+            position = found + sep_len
+
+    def chunk_span(self, text, start, end, page=None):
+        """Yield chunk dicts (without index) for text[start:end], which is treated as one page"""
+        sep_len = len(self.separator)
+        window = deque()
+        total = 0
+
+        for piece_start, piece_end in self._pieces(text, start, end):
+            length = piece_end - piece_start
+            if window and total + length + sep_len > self.chunk_size:
+                chunk = self._chunk(text, window[0][0], window[-1][1], page)
+                if chunk:
+                    yield chunk
+                # Drop pieces from the front until only the overlap is left and the new piece fits
+                while window and (
+                    total > self.chunk_overlap
+                    or total + length + sep_len > self.chunk_size
+                ):
+                    dropped_start, dropped_end = window.popleft()
+                    total -= (dropped_end - dropped_start) + (sep_len if window else 0)
+            window.append((piece_start, piece_end))
+            total += length + (sep_len if len(window) > 1 else 0)
+
+        if window:
+            chunk = self._chunk(text, window[0][0], window[-1][1], page)
+            if chunk:
+                yield chunk
+
+    def chunk(self, text, page_spans=None):
+        """Chunk the whole text, one page at a time when page_spans [(page, start, end)] is given"""
+        if page_spans is None:
+            page_spans = [(None, 0, len(text))]
+
+        chunks = []
+        for page, start, end in page_spans:
+            for chunk in self.chunk_span(text, start, end, page):
+                chunks.append({"index": len(chunks), **chunk})
+        return chunks
+
+    @staticmethod
+    def _chunk(text, start, end, page):
+        """Chunk dict for text[start:end] with surrounding whitespace trimmed, or None if blank"""
+        raw = text[start:end]
+        content = raw.strip()
+        if not content:
+            return None
+        start += len(raw) - len(raw.lstrip())
+        end = start + len(content)
+        return {
+            "content": content,
+            "length": end - start,
+            "startIndex": start,
+            "endIndex": end,
+            "page": page,
+            "wordCount": len(content.split())
+        }
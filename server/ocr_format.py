@@ -0,0 +1,129 @@
+import json
+import struct
+
+# Compact results list each chunk as a row of these fields; content is text[startIndex:endIndex]
+CHUNK_FIELDS = ["startIndex", "endIndex", "page", "wordCount"]
+
+# Binary results: magic, version byte, then length-prefixed header JSON, UTF-8 text and chunk table
+BINARY_MAGIC = b"OCRB"
+BINARY_VERSION = 1
+# Binary chunk rows add the UTF-8 byte range of the content, so readers can decode it in place
+BINARY_CHUNK_FIELDS = ["startIndex", "endIndex", "byteStart", "byteEnd", "page", "wordCount"]
+
+
+def compact_result(result):
+    """Result with chunks as offset rows into the text instead of dicts that repeat their content"""
+    compact = {}
+    for key, value in result.items():
+        if key == "chunks":
+            compact["format"] = "compact"
+            compact["chunk_fields"] = CHUNK_FIELDS
+            value = [[chunk[field] for field in CHUNK_FIELDS] for chunk in value]
+        compact[key] = value
+    return compact
+
+
+def expand_compact(compact):
+    """Turn a compact result back into the standard one"""
+    text = compact["text"]
+    result = {}
+    for key, value in compact.items():
+        if key in ("format", "chunk_fields"):
+            continue
+        if key == "chunks":
+            value = [
+                _chunk(index, text[start:end], start, end, page, word_count)
+                for index, (start, end, page, word_count) in enumerate(value)
+            ]
+        result[key] = value
+    return result
+
+
+def encode_binary(result):
+    """Length-prefixed binary encoding of a result.
+
+    Layout (little-endian): b"OCRB", version byte, u32 header length + header JSON (everything but
+    text and chunks), u32 text length + UTF-8 text, u32 chunk count + one row of six u32s per chunk
+    (BINARY_CHUNK_FIELDS, page 0 meaning none).
+    """
+    text = result["text"]
+    encoded_text = text.encode("utf-8")
+    chunks = result["chunks"]
+    byte_offsets = _byte_offsets(
+        text, [chunk["startIndex"] for chunk in chunks] + [chunk["endIndex"] for chunk in chunks]
+    )
+
+    rows = []
+    for chunk in chunks:
+        rows.extend((
+            chunk["startIndex"],
+            chunk["endIndex"],
+            byte_offsets[chunk["startIndex"]],
+            byte_offsets[chunk["endIndex"]],
+            chunk["page"] or 0,
+            chunk["wordCount"]
+        ))
+
+    header = json.dumps(
+        {key: value for key, value in result.items() if key not in ("text", "chunks")}
+    ).encode("utf-8")
+    return b"".join((
+        BINARY_MAGIC,
+        struct.pack("<BI", BINARY_VERSION, len(header)),
+        header,
+        struct.pack("<I", len(encoded_text)),
+        encoded_text,
+        struct.pack(f"<I{len(rows)}I", len(chunks), *rows)
+    ))
+
+
+def decode_binary(data):
+    """Decode encode_binary output back into the standard result"""
+    if data[:4] != BINARY_MAGIC:
+        raise ValueError("Not a binary OCR result")
+    version, header_length = struct.unpack_from("<BI", data, 4)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary OCR result version: {version}")
+    offset = 9
+    result = json.loads(data[offset:offset + header_length])
+    offset += header_length
+    (text_length,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    text_start = offset
+    result["text"] = data[text_start:text_start + text_length].decode("utf-8")
+    offset += text_length
+    (chunk_count,) = struct.unpack_from("<I", data, offset)
+    rows = struct.unpack_from(f"<{chunk_count * 6}I", data, offset + 4)
+
+    chunks = []
+    for index in range(chunk_count):
+        start, end, byte_start, byte_end, page, word_count = rows[index * 6:index * 6 + 6]
+        content = data[text_start + byte_start:text_start + byte_end].decode("utf-8")
+        chunks.append(_chunk(index, content, start, end, page or None, word_count))
+    result["chunks"] = chunks
+    return result
+
+
+def _chunk(index, content, start, end, page, word_count):
+    return {
+        "index": index,
+        "content": content,
+        "length": end - start,
+        "startIndex": start,
+        "endIndex": end,
+        "page": page,
+        "wordCount": word_count
+    }
+
+
+def _byte_offsets(text, offsets):
+    """Map character offsets into text to UTF-8 byte offsets, in one pass over the text"""
+    if text.isascii():
+        return {offset: offset for offset in offsets}
+    mapping = {}
+    position = byte_position = 0
+    for offset in sorted(set(offsets)):
+        byte_position += len(text[position:offset].encode("utf-8"))
+        position = offset
+        mapping[offset] = byte_position
+    return mapping
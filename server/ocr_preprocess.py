@@ -0,0 +1,108 @@
+import time
+
+import numpy as np
+
+# Long edge of an A4 page in inches, used to estimate the resolution of photos and scans without
+# trustworthy DPI metadata (phone cameras report 72 dpi whatever the framing)
+PAGE_LONG_EDGE_INCHES = 11.69
+
+# Upscaling past this only makes Tesseract slower without recovering detail that isn't there
+MAX_UPSCALE = 2.0
+
+# The skew search runs on a copy at most this wide, using at most this many ink pixels
+SKEW_SEARCH_WIDTH = 1000
+SKEW_SEARCH_POINTS = 50000
+
+
+def photo_scale(size, target_dpi):
+    """Resampling factor that brings a full-page photo or scan of this pixel size to target_dpi"""
+    source_dpi = max(size) / PAGE_LONG_EDGE_INCHES
+    return min(target_dpi / source_dpi, MAX_UPSCALE)
+
+
+def otsu_threshold(hist):
+    """Otsu's threshold for a 256-bin grayscale histogram"""
+    hist = np.asarray(hist, dtype=np.float64)
+    weight = np.cumsum(hist)
+    mass = np.cumsum(hist * np.arange(256))
+    total = weight[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mass[-1] * weight - mass * total) ** 2 / (weight * (total - weight))
+    return int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+
+
+def estimate_skew(gray, threshold, max_degrees, step=0.25):
+    """Angle in degrees to rotate by (counter-clockwise) so the text lines of a uint8 page are horizontal.
+
+    Pixels at or below threshold count as ink.
+
+    Every candidate angle is scored at once: the ink coordinates are sheared by each angle's
+    tangent, binned into rows with one bincount, and the sum of squared row counts, which peaks
+    when text lines fall into as few rows as possible, picks the winner.
+    """
+    stride = max(1, -(-gray.shape[1] // SKEW_SEARCH_WIDTH))
+    ys, xs = np.nonzero(gray[::stride, ::stride] <= threshold)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > SKEW_SEARCH_POINTS:
+        keep = slice(None, None, -(-len(ys) // SKEW_SEARCH_POINTS))
+        ys, xs = ys[keep], xs[keep]
+
+    angles = np.arange(-max_degrees, max_degrees + step / 2, step)
+    tangents = np.tan(np.radians(angles)).astype(np.float32)
+    rows = np.rint(ys[None, :] - xs[None, :] * tangents[:, None]).astype(np.int64)
+    rows -= rows.min()
+    height = int(rows.max()) + 1
+    rows += np.arange(len(angles))[:, None] * height
+    counts = np.bincount(rows.ravel(), minlength=len(angles) * height).reshape(len(angles), height)
+    scores = (counts.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(np.argmax(scores))])
+
+
+def preprocess(img, scale=1.0, max_skew=5.0, blank_ink_ratio=0.0001):
+    """Prepare a PIL image for Tesseract: grayscale, resample, blank check, binarise, deskew.
+
+    Returns the prepared image, or None for a blank page, and the time each step took in ms.
+    A page is blank when fewer than blank_ink_ratio of its pixels are dark.
+    """
+    from PIL import Image
+
+    timings = {}
+
+    start = time.perf_counter()
+    gray = img if img.mode == "L" else img.convert("L")
+    timings["grayscale_ms"] = _elapsed_ms(start)
+
+    start = time.perf_counter()
+    if abs(scale - 1) > 0.1:
+        size = (max(1, round(gray.width * scale)), max(1, round(gray.height * scale)))
+        gray = gray.resize(size, Image.LANCZOS if scale > 1 else Image.BILINEAR)
+    timings["resample_ms"] = _elapsed_ms(start)
+
+    start = time.perf_counter()
+    pixels = np.asarray(gray)
+    # Every 4th pixel each way is plenty for page-level statistics at OCR resolutions
+    sample = pixels[::4, ::4]
+    hist = np.bincount(sample.ravel(), minlength=256)
+    blank = hist[:128].sum() < blank_ink_ratio * sample.size
+    timings["blank_check_ms"] = _elapsed_ms(start)
+    if blank:
+        return None, timings
+
+    start = time.perf_counter()
+    threshold = otsu_threshold(hist)
+    binary = gray.point([0] * (threshold + 1) + [255] * (255 - threshold))
+    timings["binarise_ms"] = _elapsed_ms(start)
+
+    start = time.perf_counter()
+    if max_skew > 0:
+        angle = estimate_skew(pixels, threshold, max_skew)
+        if angle:
+            binary = binary.rotate(angle, resample=Image.NEAREST, fillcolor=255)
+    timings["deskew_ms"] = _elapsed_ms(start)
+
+    return binary, timings
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
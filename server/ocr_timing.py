@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+# Allocation sites listed in a job's tracemalloc dump
+PROFILE_TOP_ALLOCATIONS = 25
+
+# tracemalloc is process-wide, so only one job is profiled at a time
+_PROFILE_LOCK = threading.Lock()
+
+
+class Timings:
+    """Wall-clock ms a job spends in each stage, in total and per page"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.pages = {}
+
+    def add(self, stage, start, page=None):
+        """Charge the time since start (a time.perf_counter() value) to stage, and to page when given"""
+        self.add_ms(stage, (time.perf_counter() - start) * 1000, page)
+
+    def add_ms(self, stage, ms, page=None):
+        self.stages[stage] = self.stages.get(stage, 0) + ms
+        if page is not None:
+            entry = self.page(page)
+            entry[f"{stage}_ms"] = entry.get(f"{stage}_ms", 0) + ms
+
+    def page(self, page):
+        """The timing entry of one page, created on first use"""
+        return self.pages.setdefault(page, {"page": page})
+
+    def report(self, byte_count, page_stats):
+        """The "timings" block of a result; page_stats counts pages by source as in _PageText.stats"""
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return {
+            "total_ms": round(total_ms, 2),
+            "stages": {stage: round(ms, 2) for stage, ms in self.stages.items()},
+            "pages": [
+                {key: round(value, 2) if key.endswith("_ms") else value for key, value in entry.items()}
+                for _, entry in sorted(self.pages.items())
+            ],
+            "text_layer_pages": page_stats.get("text", 0),
+            "ocr_pages": page_stats.get("ocr", 0),
+            "mixed_pages": page_stats.get("mixed", 0),
+            "reused_pages": page_stats.get("cache", 0),
+            "bytes": byte_count,
+            "mb_per_sec": round(byte_count / 1024 / 1024 / (total_ms / 1000), 2) if total_ms else None
+        }
+
+
+def profile_job(directory, fn, *args, **kwargs):
+    """Run fn under cProfile and tracemalloc and dump both into directory.
+
+    Returns fn's result and the dump's {"cprofile", "tracemalloc", "peak_traced_mb"}, or None in
+    its place when another job is already being profiled. Only the calling thread is profiled;
+    pool workers and Tesseract run in other processes.
+    """
+    import cProfile
+    import tracemalloc
+
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        return fn(*args, **kwargs), None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"ocr-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}")
+        tracemalloc.start(10)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        profiler.dump_stats(base + ".prof")
+        with open(base + ".tracemalloc.txt", "w", encoding="utf-8") as f:
+            f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MB\n")
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+        return result, {
+            "cprofile": base + ".prof",
+            "tracemalloc": base + ".tracemalloc.txt",
+            "peak_traced_mb": round(peak / 1024 / 1024, 1)
+        }
+    finally:
+        _PROFILE_LOCK.release()
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+
+class TokenBucket:
+    """Thread-safe token bucket: holds up to capacity tokens and refills at rate tokens per second.
+
+    One bucket shared by every caller in the process limits all of them together. A rate of 0 or
+    less disables limiting.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        # Total seconds callers have spent waiting for tokens
+        self.waited = 0.0
+
+    def _take(self, tokens):
+        """Refill, then take tokens if there are enough: 0, or the seconds until there would be"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """Take tokens, waiting for the bucket to refill; False if that would take longer than timeout"""
+        if self.rate <= 0:
+            return True
+        # A request larger than the bucket could never be served, so it waits for a full bucket
+        tokens = min(tokens, self.capacity)
+        started = time.monotonic()
+        while True:
+            wait = self._take(tokens)
+            now = time.monotonic()
+            if not wait:
+                with self.lock:
+                    self.waited += now - started
+                return True
+            if timeout is not None and now + wait > started + timeout:
+                return False
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket kept in a SQLite file, so every process using the same path and name shares it.
+
+    Each attempt refills and takes tokens in one short write transaction, using wall-clock time so
+    that all processes agree on it. When the file can't be used, the bucket limits this process
+    alone rather than failing the caller.
+    """
+
+    def __init__(self, path, name, rate, capacity):
+        super().__init__(rate, capacity)
+        self.path = path
+        self.name = name
+        self._ready = False
+
+    def _connect(self):
+        # One short-lived connection per attempt; transactions are managed by hand
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _take(self, tokens):
+        try:
+            return self._take_shared(tokens)
+        except (sqlite3.Error, OSError):
+            return super()._take(tokens)
+
+    def _take_shared(self, tokens):
+        if not self._ready:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            if not self._ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+                )
+                self._ready = True
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                available = self.capacity
+                if row is not None:
+                    available = min(self.capacity, row[0] + max(now - row[1], 0) * self.rate)
+                wait = 0.0
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    wait = (tokens - available) / self.rate
+                conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (self.name, available, now))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return wait
@@ -0,0 +1,89 @@
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = frozenset(["gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "_ga"])
+
+SIMHASH_BITS = 64
+# Words per shingle: short enough that snippets of a few dozen words still get several
+SHINGLE_SIZE = 3
+
+
+def canonical_url(url):
+    """url with the parts that don't change the page folded away.
+
+    Scheme and host are lowercased, http is treated as https, and "www.", default ports,
+    fragments, tracking parameters and trailing slashes are dropped. Remaining query
+    parameters are sorted.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    path = parts.path.rstrip("/")
+    scheme = parts.scheme.lower()
+    return urlunsplit(("https" if scheme == "http" else scheme, host, path, urlencode(query), ""))
+
+
+def simhash(text):
+    """64-bit SimHash of text's word shingles, or None when it has no words"""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if not tokens:
+        return None
+    size = min(SHINGLE_SIZE, len(tokens))
+    weights = [0] * SIMHASH_BITS
+    for i in range(len(tokens) - size + 1):
+        shingle = " ".join(tokens[i:i + size])
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def collapse_duplicates(results, max_distance=3):
+    """Merge search results that are the same page, keeping the first copy of each.
+
+    Two results are the same page when their canonical URLs match, or when the SimHashes of
+    their title and snippet differ in at most max_distance bits. The kept record gets
+    "queries_used", every query that found it in order, and "duplicate_urls", the other
+    URLs merged into it. A max_distance below 0 only merges matching URLs.
+    """
+    kept = []
+    by_url = {}
+    fingerprints = []
+    for result in results:
+        url = canonical_url(result["url"])
+        fingerprint = simhash(result["title"] + " " + result["snippet"])
+        match = by_url.get(url)
+        if match is None and fingerprint is not None:
+            for index, other in fingerprints:
+                if bin(fingerprint ^ other).count("1") <= max_distance:
+                    match = index
+                    break
+
+        if match is None:
+            by_url[url] = len(kept)
+            if fingerprint is not None:
+                fingerprints.append((len(kept), fingerprint))
+            kept.append({**result, "queries_used": [result["query_used"]], "duplicate_urls": []})
+            continue
+
+        record = kept[match]
+        by_url.setdefault(url, match)
+        if result["query_used"] not in record["queries_used"]:
+            record["queries_used"].append(result["query_used"])
+        if result["url"] != record["url"] and result["url"] not in record["duplicate_urls"]:
+            record["duplicate_urls"].append(result["url"])
+    return kept
@@ -15,6 +15,10 @@ if (!fs.existsSync(tempDir)) {
     fs.mkdirSync(tempDir, { recursive: true });
 }
 
+// OCR_DEADLINE_SECONDS can cut a document short. Such a result is saved as 'partial' with the
+// pages it is missing, and its upload stays on disk until POST /resume/:fileId finishes it.
+const processingStatusOf = (ocrResult) => (ocrResult.partial ? 'partial' : 'completed');
+
 /**
  * Upload and process single file for OCR
  */
@@ -57,6 +61,7 @@ router.post('/upload-single', upload.single('file'), async (req, res) => {
 
         let cloudinaryResponse = null;
         let savedResult = null;
+        let keepSource = false;
 
         if (ocrResult.success) {
             // Upload to Cloudinary
@@ -83,11 +88,14 @@ router.post('/upload-single', upload.single('file'), async (req, res) => {
                         chunkCount: ocrResult.chunk_count
                     },
                     chunks: ocrResult.chunks,
-                    processingStatus: 'completed',
+                    processingStatus: processingStatusOf(ocrResult),
+                    unprocessedPages: ocrResult.unprocessed_pages || [],
+                    sourcePath: ocrResult.partial ? path.resolve(localFilePath) : null,
                     error: null
                 });
                 
                 await savedResult.save();
+                keepSource = !!ocrResult.partial;
                 console.log('OCR result saved to database with ID:', fileId);
             } catch (dbError) {
                 console.error('Error saving to database:', dbError);
@@ -122,14 +130,16 @@ router.post('/upload-single', upload.single('file'), async (req, res) => {
             }
         }
 
-        // Clean up temporary file
-        if (fs.existsSync(localFilePath)) {
+        // Clean up temporary file, unless a saved partial result still needs it
+        if (!keepSource && fs.existsSync(localFilePath)) {
             fs.unlinkSync(localFilePath);
         }
 
         res.json({
             success: ocrResult.success,
-            message: ocrResult.success ? 'File processed successfully' : 'Failed to process file',
+            message: !ocrResult.success
+                ? 'Failed to process file'
+                : ocrResult.partial ? 'File partially processed' : 'File processed successfully',
             data: {
                 fileId: savedResult?.fileId || null,
                 filename: file.originalname,
@@ -143,6 +153,8 @@ router.post('/upload-single', upload.single('file'), async (req, res) => {
                     chunkCount: ocrResult.chunk_count
                 },
                 chunks: ocrResult.chunks.slice(0, 5), // Return first 5 chunks for preview
+                processingStatus: ocrResult.success ? processingStatusOf(ocrResult) : 'failed',
+                unprocessedPages: ocrResult.unprocessed_pages || [],
                 error: ocrResult.error || null
             }
         });
@@ -188,6 +200,13 @@ router.post('/upload-multiple', upload.array('files', 10), async (req, res) => {
         const results = [];
         const supportedTypes = ['image/jpeg', 'image/png', 'image/jpg', 'application/pdf'];
 
+        // OCR every supported file in a single batch so their pages share one worker pool
+        const ocrResults = await OCRService.processFiles(
+            req.files
+                .filter(file => supportedTypes.includes(file.mimetype))
+                .map(file => ({ filePath: file.path, fileType: file.mimetype }))
+        );
+
         for (const file of req.files) {
             const localFilePath = file.path;
 
@@ -205,11 +224,12 @@ router.post('/upload-multiple', upload.array('files', 10), async (req, res) => {
                         fs.unlinkSync(localFilePath);
                     }
                     continue;
-                }                // Process file with OCR
-                const ocrResult = await OCRService.processFile(localFilePath, file.mimetype);
+                }                // Result from the batch OCR run above
+                const ocrResult = ocrResults[localFilePath];
 
                 let cloudinaryResponse = null;
                 let savedResult = null;
+                let keepSource = false;
                 const fileId = uuidv4();
 
                 if (ocrResult.success) {
@@ -233,11 +253,14 @@ router.post('/upload-multiple', upload.array('files', 10), async (req, res) => {
                                 chunkCount: ocrResult.chunk_count
                             },
                             chunks: ocrResult.chunks,
-                            processingStatus: 'completed',
+                            processingStatus: processingStatusOf(ocrResult),
+                            unprocessedPages: ocrResult.unprocessed_pages || [],
+                            sourcePath: ocrResult.partial ? path.resolve(localFilePath) : null,
                             error: null
                         });
                         
                         await savedResult.save();
+                        keepSource = !!ocrResult.partial;
                         console.log('OCR result saved to database with ID:', fileId);
                     } catch (dbError) {
                         console.error('Error saving to database:', dbError);
@@ -288,11 +311,13 @@ router.post('/upload-multiple', upload.array('files', 10), async (req, res) => {
                         chunkCount: ocrResult.chunk_count
                     },
                     chunks: ocrResult.chunks.slice(0, 3), // Return first 3 chunks for each file
+                    processingStatus: ocrResult.success ? processingStatusOf(ocrResult) : 'failed',
+                    unprocessedPages: ocrResult.unprocessed_pages || [],
                     error: ocrResult.error || null
                 });
 
-                // Clean up temporary file
-                if (fs.existsSync(localFilePath)) {
+                // Clean up temporary file, unless a saved partial result still needs it
+                if (!keepSource && fs.existsSync(localFilePath)) {
                     fs.unlinkSync(localFilePath);
                 }} catch (error) {
                 console.error(`Error processing file ${file.originalname}:`, error);
@@ -379,6 +404,7 @@ router.get('/result/:fileId', async (req, res) => {
                 textStats: ocrResult.textStats,
                 chunks: ocrResult.chunks,
                 processingStatus: ocrResult.processingStatus,
+                unprocessedPages: ocrResult.unprocessedPages,
                 error: ocrResult.error,
                 createdAt: ocrResult.createdAt
             }
@@ -393,6 +419,91 @@ router.get('/result/:fileId', async (req, res) => {
     }
 });
 
+/**
+ * Finish a partial OCR result. The whole document is run again, so text and chunk offsets cover
+ * every page; pages OCR'd before the deadline come from the Python page cache, so only the missing
+ * ones cost OCR time. A run that is cut short again is saved with its remaining pages.
+ */
+router.post('/resume/:fileId', async (req, res) => {
+    try {
+        const { fileId } = req.params;
+        
+        // Find OCR result by fileId and userId (for security)
+        const ocrRecord = await OCRResult.findOne({ 
+            fileId: fileId, 
+            userId: req.user.id 
+        });
+        
+        if (!ocrRecord) {
+            return res.status(404).json({
+                success: false,
+                message: 'OCR result not found'
+            });
+        }
+
+        if (ocrRecord.processingStatus !== 'partial') {
+            return res.status(400).json({
+                success: false,
+                message: 'Only partial OCR results can be resumed'
+            });
+        }
+
+        if (!ocrRecord.sourcePath || !fs.existsSync(ocrRecord.sourcePath)) {
+            return res.status(410).json({
+                success: false,
+                message: 'The uploaded file is no longer available. Please upload it again.'
+            });
+        }
+
+        const ocrResult = await OCRService.processFile(ocrRecord.sourcePath, ocrRecord.fileType);
+        if (!ocrResult.success) {
+            // The stored partial result and its file are kept, so the resume can be retried
+            return res.status(500).json({
+                success: false,
+                message: 'Failed to resume file processing',
+                error: ocrResult.error
+            });
+        }
+
+        const sourcePath = ocrRecord.sourcePath;
+        ocrRecord.extractedText = ocrResult.text;
+        ocrRecord.textStats = {
+            wordCount: ocrResult.word_count,
+            characterCount: ocrResult.text_length,
+            chunkCount: ocrResult.chunk_count
+        };
+        ocrRecord.chunks = ocrResult.chunks;
+        ocrRecord.processingStatus = processingStatusOf(ocrResult);
+        ocrRecord.unprocessedPages = ocrResult.unprocessed_pages || [];
+        ocrRecord.sourcePath = ocrResult.partial ? sourcePath : null;
+        await ocrRecord.save();
+
+        if (!ocrResult.partial && fs.existsSync(sourcePath)) {
+            fs.unlinkSync(sourcePath);
+        }
+
+        res.json({
+            success: true,
+            message: ocrResult.partial ? 'File partially processed' : 'File processed successfully',
+            data: {
+                fileId: ocrRecord.fileId,
+                filename: ocrRecord.originalName,
+                textStats: ocrRecord.textStats,
+                chunks: ocrResult.chunks.slice(0, 5), // Return first 5 chunks for preview
+                processingStatus: ocrRecord.processingStatus,
+                unprocessedPages: ocrRecord.unprocessedPages
+            }
+        });
+    } catch (error) {
+        console.error('Error resuming OCR result:', error);
+        res.status(500).json({
+            success: false,
+            message: 'Error resuming OCR result',
+            error: error.message
+        });
+    }
+});
+
 /**
  * Get text chunks for a specific file (for pagination)
  */
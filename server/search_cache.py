@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+
+class SearchCache:
+    """TTL cache of JSON values (search results, LLM replies) in one SQLite file, safe to share between processes.
+
+    Entries expire ttl seconds after they were stored. Once the stored values pass max_bytes,
+    the least recently used entries are evicted. Hit and miss counts are kept in the database
+    too, so stats() reports the hit rate across every process that used the cache, not just
+    this one. WAL mode lets readers carry on while another process writes.
+    """
+
+    def __init__(self, path, max_bytes, ttl):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+
+    def _connect(self):
+        # One short-lived connection per call, since searches run on several threads
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or once it has expired"""
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT value FROM entries WHERE key = ? AND stored_at > ?", (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+                conn.execute(
+                    "UPDATE counters SET value = value + 1 WHERE name = ?", ("hits" if row else "misses",)
+                )
+        except sqlite3.Error:
+            # Locked past the timeout or unreadable: count it as a miss rather than fail the search
+            row = None
+        with self._stats_lock:
+            if row is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key, value):
+        """Store value under key, then drop expired entries and evict down to the size limit"""
+        now = time.time()
+        data = json.dumps(value)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", (key, data, len(data), now, now)
+            )
+            conn.execute("DELETE FROM entries WHERE stored_at <= ?", (now - self.ttl,))
+            # Keep the most recently used entries that fit in max_bytes
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY used_at DESC, key) AS total FROM entries) "
+                "WHERE total > ?)",
+                (self.max_bytes,)
+            )
+
+    def stats(self):
+        """Hit rate of this process and of the cache as a whole, and its current size"""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            process = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+        with closing(self._connect()) as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **process,
+            "total_hits": counters["hits"],
+            "total_misses": counters["misses"],
+            "total_hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size
+        }
+
+
+def search_cache_key(query, region, max_results):
+    """SHA-256 of a search's normalised query (case and spacing folded), region and result count"""
+    normalised = " ".join(query.lower().split())
+    return hashlib.sha256(json.dumps([normalised, region, max_results]).encode("utf-8")).hexdigest()
+
+
+def prompt_cache_key(model, prompt):
+    """SHA-256 of the model name plus the exact prompt sent to it"""
+    return hashlib.sha256(json.dumps([model, prompt]).encode("utf-8")).hexdigest()
@@ -2,6 +2,7 @@ import { spawn } from 'child_process';
 import fs from 'fs';
 import path from 'path';
 import { fileURLToPath } from 'url';
+import { expandCompactResult, decodeBinaryResult } from '../utils/ocrResultFormat.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
@@ -9,24 +10,172 @@ const __dirname = path.dirname(__filename);
 class OCRService {
     constructor() {
         this.pythonScriptPath = path.join(__dirname, '../ocr.py');
+        // Opt-in long-lived `ocr.py --serve` process shared by all requests
+        this.usePersistentWorker = process.env.OCR_PERSISTENT_WORKER === 'true';
+        this.worker = null;
+        this.workerBuffer = '';
+        this.pendingJobs = new Map();
+        this.nextJobId = 1;
+        // A worker job not answered within this many seconds (or its deadline plus a minute, if
+        // later) fails, and the worker is restarted in case it is stuck
+        this.workerJobTimeoutSeconds = Number(process.env.OCR_WORKER_JOB_TIMEOUT_SECONDS || 600);
+        // Wire format of single-file results: json (default), compact or binary. The persistent
+        // worker speaks NDJSON, so it uses compact for either of the smaller formats.
+        this.resultFormat = process.env.OCR_RESULT_FORMAT || 'json';
+    }
+
+    /**
+     * Start (or reuse) the persistent Python OCR worker
+     */
+    getWorker() {
+        if (this.worker) {
+            return this.worker;
+        }
+
+        console.log('Starting persistent OCR worker');
+        const worker = spawn('python', [this.pythonScriptPath, '--serve']);
+
+        worker.stdout.on('data', (data) => {
+            // Late output of a worker that was replaced after a timeout
+            if (this.worker !== worker) return;
+            this.workerBuffer += data.toString();
+            let newlineIndex;
+            while ((newlineIndex = this.workerBuffer.indexOf('\n')) !== -1) {
+                const line = this.workerBuffer.slice(0, newlineIndex).trim();
+                this.workerBuffer = this.workerBuffer.slice(newlineIndex + 1);
+                if (!line) continue;
+
+                try {
+                    const parsedResult = JSON.parse(line);
+                    const job = this.pendingJobs.get(parsedResult.id);
+                    if (job) {
+                        clearTimeout(job.timer);
+                        this.pendingJobs.delete(parsedResult.id);
+                        delete parsedResult.id;
+                        job.resolve(expandCompactResult(parsedResult));
+                    }
+                } catch (parseError) {
+                    console.error('Error parsing OCR worker output:', parseError);
+                    console.error('Raw output:', line);
+                }
+            }
+        });
+
+        worker.stderr.on('data', (data) => {
+            console.error('OCR worker stderr:', data.toString());
+        });
+
+        const failPending = (error) => {
+            if (this.worker === worker) {
+                this.worker = null;
+                this.workerBuffer = '';
+            }
+            // Only this worker's jobs: after a timeout restart, newer jobs belong to its replacement
+            for (const [id, job] of this.pendingJobs) {
+                if (job.worker !== worker) continue;
+                clearTimeout(job.timer);
+                this.pendingJobs.delete(id);
+                job.reject(error);
+            }
+        };
+
+        worker.on('close', (code) => {
+            console.error(`OCR worker exited with code: ${code}`);
+            failPending(new Error(`OCR worker exited with code ${code}`));
+        });
+
+        worker.on('error', (error) => {
+            console.error('Failed to start OCR worker:', error);
+            failPending(new Error(`Failed to start OCR worker: ${error.message}`));
+        });
+
+        // Writing a job to a worker that has just died (e.g. killed for memory) fails with EPIPE
+        worker.stdin.on('error', (error) => {
+            console.error('Failed to send job to OCR worker:', error);
+            failPending(new Error(`OCR worker stopped accepting jobs: ${error.message}`));
+        });
+
+        this.worker = worker;
+        return worker;
+    }
+
+    /**
+     * Send a job to the persistent OCR worker
+     */
+    async executeWithWorker(filePath, fileType, options = {}) {
+        return new Promise((resolve, reject) => {
+            const id = this.nextJobId++;
+            const worker = this.getWorker();
+            const timeoutSeconds = Math.max(
+                this.workerJobTimeoutSeconds,
+                options.deadline ? Number(options.deadline) + 60 : 0
+            );
+            const timer = setTimeout(() => {
+                if (!this.pendingJobs.delete(id)) return;
+                reject(new Error(`OCR worker did not answer within ${timeoutSeconds}s`));
+                // Its other jobs fail with it, through 'close', and the next job starts a new worker
+                console.error(`OCR job ${id} timed out; restarting the OCR worker`);
+                if (this.worker === worker) {
+                    this.worker = null;
+                    this.workerBuffer = '';
+                }
+                worker.kill();
+            }, timeoutSeconds * 1000);
+            this.pendingJobs.set(id, { resolve, reject, timer, worker });
+            const job = {
+                id,
+                file_path: filePath,
+                file_type: fileType,
+                deadline: options.deadline,
+                page_timeout: options.pageTimeout,
+                pages: options.pages
+            };
+            if (this.resultFormat !== 'json') {
+                job.format = 'compact';
+            }
+            worker.stdin.write(JSON.stringify(job) + '\n');
+        });
+    }
+
+    /**
+     * ocr.py flags for per-request limits: { deadline, pageTimeout } in seconds, and pages
+     * (e.g. a previous partial result's unprocessed_pages) to resume
+     */
+    limitArgs(options = {}) {
+        const args = [];
+        if (options.deadline) {
+            args.push(`--deadline=${options.deadline}`);
+        }
+        if (options.pageTimeout) {
+            args.push(`--page-timeout=${options.pageTimeout}`);
+        }
+        if (options.pages && options.pages.length) {
+            args.push(`--pages=${options.pages.join(',')}`);
+        }
+        return args;
     }
 
     /**
      * Execute Python OCR script using spawn
      */
-    async executePythonScript(filePath, fileType) {
+    async executePythonScript(filePath, fileType, options = {}) {
         return new Promise((resolve, reject) => {
             console.log(`Starting OCR process for: ${filePath}`);
             
             // Spawn Python process
-            const pythonProcess = spawn('python', [this.pythonScriptPath, filePath, fileType]);
+            const args = [this.pythonScriptPath, filePath, fileType];
+            if (this.resultFormat !== 'json') {
+                args.push(`--format=${this.resultFormat}`);
+            }
+            args.push(...this.limitArgs(options));
+            const pythonProcess = spawn('python', args);
             
-            let result = '';
+            const output = [];
             let errorOutput = '';
 
             // Collect data from Python script
             pythonProcess.stdout.on('data', (data) => {
-                result += data.toString();
+                output.push(data);
             });
 
             // Collect error output
@@ -40,13 +189,16 @@ class OCRService {
                 console.log(`Python process exited with code: ${code}`);
                 
                 if (code === 0) {
+                    const result = Buffer.concat(output);
                     try {
-                        // Parse JSON result from Python script
-                        const parsedResult = JSON.parse(result.trim());
+                        // Parse the result from Python script in whichever format was requested
+                        const parsedResult = this.resultFormat === 'binary'
+                            ? decodeBinaryResult(result)
+                            : expandCompactResult(JSON.parse(result.toString().trim()));
                         resolve(parsedResult);
                     } catch (parseError) {
                         console.error('Error parsing Python output:', parseError);
-                        console.error('Raw output:', result);
+                        console.error('Raw output:', result.toString());
                         reject(new Error('Failed to parse OCR result'));
                     }
                 } else {
@@ -65,9 +217,185 @@ class OCRService {
     }
 
     /**
-     * Process file using Python OCR script
+     * OCR a document held in memory (e.g. a multer memoryStorage upload) by piping its bytes
+     * to `ocr.py -`, so nothing has to be written to or cleaned up from disk
+     */
+    async processBuffer(buffer, fileType) {
+        return new Promise((resolve) => {
+            const pythonProcess = spawn('python', [this.pythonScriptPath, '-', fileType]);
+
+            let result = '';
+            let errorOutput = '';
+            const fail = (message) => resolve({
+                success: false,
+                error: message,
+                text: '',
+                text_length: 0,
+                word_count: 0,
+                chunk_count: 0,
+                chunks: []
+            });
+
+            pythonProcess.stdout.on('data', (data) => {
+                result += data.toString();
+            });
+
+            pythonProcess.stderr.on('data', (data) => {
+                errorOutput += data.toString();
+                console.error('Python stderr:', data.toString());
+            });
+
+            pythonProcess.on('close', (code) => {
+                if (code !== 0) {
+                    fail(`OCR process failed: ${errorOutput || 'Unknown error'}`);
+                    return;
+                }
+                try {
+                    resolve(JSON.parse(result.trim()));
+                } catch (parseError) {
+                    console.error('Error parsing Python output:', parseError);
+                    console.error('Raw output:', result);
+                    fail('Failed to parse OCR result');
+                }
+            });
+
+            pythonProcess.on('error', (error) => {
+                console.error('Failed to start Python process:', error);
+                fail(`Failed to start OCR process: ${error.message}`);
+            });
+
+            // A closed pipe is reported through 'close' with the process's own error output
+            pythonProcess.stdin.on('error', () => {});
+            pythonProcess.stdin.end(buffer);
+        });
+    }
+
+    /**
+     * Process several files in one `ocr.py --batch` call so their pages share one worker pool.
+     * Resolves with a map of filePath -> OCR result.
+     */
+    async processFiles(files) {
+        const failAll = (message) => Object.fromEntries(files.map(({ filePath }) => [filePath, {
+            success: false,
+            error: message,
+            text: '',
+            text_length: 0,
+            word_count: 0,
+            chunk_count: 0,
+            chunks: []
+        }]));
+
+        if (files.length === 0) {
+            return {};
+        }
+
+        return new Promise((resolve) => {
+            console.log(`Starting batch OCR process for ${files.length} files`);
+            const pythonProcess = spawn('python', [this.pythonScriptPath, '--batch']);
+
+            let result = '';
+            let errorOutput = '';
+
+            pythonProcess.stdout.on('data', (data) => {
+                result += data.toString();
+            });
+
+            pythonProcess.stderr.on('data', (data) => {
+                errorOutput += data.toString();
+                console.error('Python stderr:', data.toString());
+            });
+
+            pythonProcess.on('close', (code) => {
+                console.log(`Batch OCR process exited with code: ${code}`);
+                if (code !== 0) {
+                    resolve(failAll(`OCR process failed: ${errorOutput || 'Unknown error'}`));
+                    return;
+                }
+
+                try {
+                    const parsedResult = JSON.parse(result.trim());
+                    resolve({ ...failAll(parsedResult.error || 'No OCR result'), ...parsedResult.results });
+                } catch (parseError) {
+                    console.error('Error parsing Python output:', parseError);
+                    console.error('Raw output:', result);
+                    resolve(failAll('Failed to parse OCR result'));
+                }
+            });
+
+            pythonProcess.on('error', (error) => {
+                console.error('Failed to start Python process:', error);
+                resolve(failAll(`Failed to start OCR process: ${error.message}`));
+            });
+
+            pythonProcess.stdin.write(JSON.stringify(files.map(({ filePath, fileType }) => ({
+                file_path: filePath,
+                file_type: fileType
+            }))));
+            pythonProcess.stdin.end();
+        });
+    }
+
+    /**
+     * Run the OCR script in streaming mode, calling onRecord for every page, chunk and
+     * summary line as soon as Python emits it. Resolves with the summary record.
+     * No route uses this yet: the upload routes store the whole result, so they call processFile.
+     */
+    async processFileStream(filePath, fileType, onRecord) {
+        return new Promise((resolve, reject) => {
+            const pythonProcess = spawn('python', [this.pythonScriptPath, filePath, fileType, '--stream']);
+
+            let buffer = '';
+            let summary = null;
+            let errorOutput = '';
+
+            pythonProcess.stdout.on('data', (data) => {
+                buffer += data.toString();
+                let newlineIndex;
+                while ((newlineIndex = buffer.indexOf('\n')) !== -1) {
+                    const line = buffer.slice(0, newlineIndex).trim();
+                    buffer = buffer.slice(newlineIndex + 1);
+                    if (!line) continue;
+
+                    try {
+                        const record = JSON.parse(line);
+                        if (record.type === 'summary') {
+                            summary = record;
+                        }
+                        onRecord(record);
+                    } catch (parseError) {
+                        console.error('Error parsing OCR stream line:', parseError);
+                        console.error('Raw output:', line);
+                    }
+                }
+            });
+
+            pythonProcess.stderr.on('data', (data) => {
+                errorOutput += data.toString();
+                console.error('Python stderr:', data.toString());
+            });
+
+            pythonProcess.on('close', (code) => {
+                if (code === 0 && summary) {
+                    resolve(summary);
+                } else {
+                    reject(new Error(`OCR process failed: ${errorOutput || 'No summary record received'}`));
+                }
+            });
+
+            pythonProcess.on('error', (error) => {
+                console.error('Failed to start Python process:', error);
+                reject(new Error(`Failed to start OCR process: ${error.message}`));
+            });
+        });
+    }
+
+    /**
+     * Process file using Python OCR script. options may set a deadline and pageTimeout (seconds);
+     * work they cut short comes back with partial: true and unprocessed_pages. Passing those back as
+     * options.pages OCRs just those pages, with offsets relative to them alone; to get one complete
+     * result, run the whole document again, and the page cache skips the pages already done.
      */
-    async processFile(filePath, fileType) {
+    async processFile(filePath, fileType, options = {}) {
         try {
             // Validate file exists
             if (!fs.existsSync(filePath)) {
@@ -75,7 +403,9 @@ class OCRService {
             }
 
             // Execute Python OCR script
-            const result = await this.executePythonScript(filePath, fileType);
+            const result = this.usePersistentWorker
+                ? await this.executeWithWorker(filePath, fileType, options)
+                : await this.executePythonScript(filePath, fileType, options);
             
             return result;
         } catch (error) {
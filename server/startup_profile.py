@@ -0,0 +1,56 @@
+import subprocess
+import sys
+import time
+
+# Cold starts are noisy, so each measurement keeps the fastest of a few runs
+RUNS = 3
+
+
+def _time_command(args):
+    """Fastest wall-clock time in ms for a fresh interpreter to run args"""
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 1)
+
+
+def profile_startup(script_path, modules, budget_ms):
+    """Measure cold start of a Python entry point against a budget.
+
+    cold_start_ms runs script_path with no arguments and empty stdin, which must exit early
+    without touching heavy dependencies. Each module in modules is then timed on its own in a
+    fresh interpreter (minus bare interpreter startup), so the numbers show what a path pays
+    when it first uses that dependency.
+    """
+    interpreter_ms = _time_command(["-c", "pass"])
+    cold_start_ms = _time_command([script_path])
+
+    imports = {}
+    for name in modules:
+        probe = subprocess.run(
+            [sys.executable, "-c", f"import {name}"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        if probe.returncode != 0:
+            imports[name] = None
+            continue
+        imports[name] = round(max(_time_command(["-c", f"import {name}"]) - interpreter_ms, 0.0), 1)
+
+    return {
+        "script": script_path,
+        "interpreter_ms": interpreter_ms,
+        "cold_start_ms": cold_start_ms,
+        "budget_ms": budget_ms,
+        "within_budget": cold_start_ms <= budget_ms,
+        "import_ms": imports
+    }
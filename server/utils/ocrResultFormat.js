@@ -0,0 +1,89 @@
+// Decoders for the compact and binary result formats of `ocr.py --format=...` (see ocr_format.py)
+
+const BINARY_MAGIC = 'OCRB';
+const BINARY_VERSION = 1;
+
+// Python offsets count code points while JS strings index UTF-16 units; the two only differ
+// once the text contains characters outside the BMP (surrogate pairs)
+const codePointSlicer = (text) => {
+    if (!/[\uD800-\uDFFF]/.test(text)) {
+        return (start, end) => text.slice(start, end);
+    }
+    const units = [0];
+    let position = 0;
+    for (const character of text) {
+        position += character.length;
+        units.push(position);
+    }
+    return (start, end) => text.slice(units[start], units[end]);
+};
+
+const makeChunk = (index, content, startIndex, endIndex, page, wordCount) => ({
+    index,
+    content,
+    length: endIndex - startIndex,
+    startIndex,
+    endIndex,
+    page,
+    wordCount
+});
+
+/**
+ * Turn a compact result (chunks as [startIndex, endIndex, page, wordCount] rows) back into the standard one
+ */
+const expandCompactResult = (compact) => {
+    if (compact.format !== 'compact') {
+        return compact;
+    }
+    const { format, chunk_fields: chunkFields, ...result } = compact;
+    const slice = codePointSlicer(result.text || '');
+    result.chunks = (result.chunks || []).map(([startIndex, endIndex, page, wordCount], index) =>
+        makeChunk(index, slice(startIndex, endIndex), startIndex, endIndex, page, wordCount)
+    );
+    return result;
+};
+
+/**
+ * Decode a length-prefixed binary result: header JSON, UTF-8 text, then a u32 chunk table
+ */
+const decodeBinaryResult = (buffer) => {
+    if (buffer.toString('latin1', 0, 4) !== BINARY_MAGIC) {
+        throw new Error('Not a binary OCR result');
+    }
+    const version = buffer.readUInt8(4);
+    if (version !== BINARY_VERSION) {
+        throw new Error(`Unsupported binary OCR result version: ${version}`);
+    }
+
+    let offset = 5;
+    const headerLength = buffer.readUInt32LE(offset);
+    offset += 4;
+    const result = JSON.parse(buffer.toString('utf8', offset, offset + headerLength));
+    offset += headerLength;
+
+    const textLength = buffer.readUInt32LE(offset);
+    offset += 4;
+    result.text = buffer.toString('utf8', offset, offset + textLength);
+    offset += textLength;
+
+    const chunkCount = buffer.readUInt32LE(offset);
+    offset += 4;
+    // Copy the table out so it can be read as one aligned Uint32Array (little-endian hosts)
+    const table = new Uint32Array(
+        buffer.buffer.slice(buffer.byteOffset + offset, buffer.byteOffset + offset + chunkCount * 24)
+    );
+    // Slicing the decoded text is cheaper than decoding every chunk's bytes again
+    const slice = codePointSlicer(result.text);
+    result.chunks = new Array(chunkCount);
+    for (let index = 0; index < chunkCount; index++) {
+        const row = index * 6;
+        const startIndex = table[row];
+        const endIndex = table[row + 1];
+        result.chunks[index] = makeChunk(
+            index, slice(startIndex, endIndex), startIndex, endIndex, table[row + 4] || null, table[row + 5]
+        );
+    }
+    return result;
+};
+
+export { expandCompactResult, decodeBinaryResult };
@@ -1,25 +1,139 @@
-from groq import Groq
-import requests
 import json
-from duckduckgo_search import DDGS
 import time
-from dotenv import load_dotenv
 import os
+import sqlite3
 import sys
-
-load_dotenv()  # Load environment variables from .env file
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import SharedTokenBucket
+from search_cache import SearchCache, prompt_cache_key, search_cache_key
+
+# groq, duckduckgo_search, dotenv and numpy are imported on first use, so paths that never need them
+# (no input, or the no-API-key fallback that never calls Groq) don't pay for them. See --startup-profile.
+# dotenv is only imported when there is a .env file to load.
+STARTUP_PROFILE_MODULES = [
+    "groq",
+    "duckduckgo_search",
+    "dotenv",
+    "numpy",
+]
+
+
+def find_env_file():
+    """The nearest .env in this script's directory or above it, as load_dotenv() would find, or None"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(directory, '.env')
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# Every setting below may be set in .env (next to GROQ_API_KEY), so it is loaded before any is read
+ENV_FILE = find_env_file()
+if ENV_FILE:
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
+
+STARTUP_BUDGET_MS = float(os.environ.get('WEBSEARCH_STARTUP_BUDGET_MS', 300))
+
+# Rate limits are kept in this SQLite file, so the websearch.py processes spawned for concurrent
+# requests share them instead of each starting with a full budget
+RATE_LIMIT_PATH = os.environ.get(
+    'RATE_LIMIT_PATH', os.path.join(tempfile.gettempdir(), 'legal-ai-rate-limits.sqlite3')
+)
+
+# DuckDuckGo queries run concurrently, DDG_CONCURRENCY at a time, and start no faster than
+# DDG_QUERIES_PER_SECOND on average with bursts of up to DDG_BURST queries
+DDG_CONCURRENCY = int(os.environ.get('DDG_CONCURRENCY', 5))
+DDG_QUERIES_PER_SECOND = float(os.environ.get('DDG_QUERIES_PER_SECOND', 0.5))
+DDG_BURST = float(os.environ.get('DDG_BURST', 5))
+# Shared by every search in every process on this machine, so concurrent requests stay within the rate together
+DDG_LIMITER = SharedTokenBucket(RATE_LIMIT_PATH, 'ddg', DDG_QUERIES_PER_SECOND, DDG_BURST)
+
+# DuckDuckGo results are cached across requests and processes in one SQLite file; 0 MB disables it
+SEARCH_CACHE_PATH = os.environ.get(
+    'SEARCH_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'legal-ai-search-cache.sqlite3')
+)
+SEARCH_CACHE_MAX_MB = float(os.environ.get('SEARCH_CACHE_MAX_MB', 16))
+SEARCH_CACHE_TTL_HOURS = float(os.environ.get('SEARCH_CACHE_TTL_HOURS', 24))
+
+# Groq replies are cached by model and exact prompt in the same way; 0 MB disables it.
+# With LLM_CACHE_BYPASS=true (or --no-llm-cache) every prompt goes to Groq and refreshes its entry
+LLM_CACHE_PATH = os.environ.get(
+    'LLM_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'legal-ai-llm-cache.sqlite3')
+)
+LLM_CACHE_MAX_MB = float(os.environ.get('LLM_CACHE_MAX_MB', 32))
+LLM_CACHE_TTL_HOURS = float(os.environ.get('LLM_CACHE_TTL_HOURS', 720))
+LLM_CACHE_BYPASS = os.environ.get('LLM_CACHE_BYPASS', 'false').lower() == 'true'
+
+# Groq calls share per-minute request and token budgets matched to the account's quota (the free
+# tier defaults below), kept in RATE_LIMIT_PATH so every websearch.py process on this machine draws
+# on the same budget; ranking sends up to GROQ_MAX_IN_FLIGHT batches at once, and a batch not
+# answered within GROQ_RANK_TIMEOUT_SECONDS (budget wait included) is scored locally instead
+GROQ_REQUESTS_PER_MINUTE = float(os.environ.get('GROQ_REQUESTS_PER_MINUTE', 30))
+GROQ_TOKENS_PER_MINUTE = float(os.environ.get('GROQ_TOKENS_PER_MINUTE', 12000))
+GROQ_MAX_IN_FLIGHT = int(os.environ.get('GROQ_MAX_IN_FLIGHT', 3))
+GROQ_RANK_TIMEOUT_SECONDS = float(os.environ.get('GROQ_RANK_TIMEOUT_SECONDS', 20))
+# Only this many of the best locally scored results are sent to Groq for ranking
+GROQ_RANK_CANDIDATES = int(os.environ.get('GROQ_RANK_CANDIDATES', 15))
+# Results whose title and snippet SimHashes differ in at most this many of 64 bits are merged as the
+# same page (as are results with the same canonical URL); -1 only merges matching URLs
+DEDUPE_SIMHASH_DISTANCE = int(os.environ.get('DEDUPE_SIMHASH_DISTANCE', 3))
+# Completion tokens reserved per call on top of the prompt estimate (about 4 characters a token)
+GROQ_COMPLETION_TOKENS = 400
+GROQ_REQUEST_LIMITER = SharedTokenBucket(
+    RATE_LIMIT_PATH, 'groq-requests', GROQ_REQUESTS_PER_MINUTE / 60, GROQ_REQUESTS_PER_MINUTE
+)
+GROQ_TOKEN_LIMITER = SharedTokenBucket(RATE_LIMIT_PATH, 'groq-tokens', GROQ_TOKENS_PER_MINUTE / 60, GROQ_TOKENS_PER_MINUTE)
 
 class FreeAIContractSearcher:
-    def __init__(self, groq_api_key=None):
+    def __init__(self, groq_api_key=None, bypass_llm_cache=LLM_CACHE_BYPASS):
         # Configure Groq
         if groq_api_key:
+            from groq import Groq
             self.client = Groq(api_key=groq_api_key)
             self.model_name = "llama-3.3-70b-versatile"
         else:
             # Fallback to local models
             self.client = None
-
-        self.ddg = DDGS()
+        self.llm_cache = None
+        if LLM_CACHE_MAX_MB > 0:
+            try:
+                self.llm_cache = SearchCache(
+                    LLM_CACHE_PATH,
+                    int(LLM_CACHE_MAX_MB * 1024 * 1024),
+                    LLM_CACHE_TTL_HOURS * 3600
+                )
+            except (sqlite3.Error, OSError) as e:
+                # Replies still come from Groq without the cache, just not reused
+                print(f"LLM cache unavailable at {LLM_CACHE_PATH}, calling Groq without it: {e}", file=sys.stderr)
+        self.bypass_llm_cache = bypass_llm_cache
+
+        self._local = threading.local()
+        self.search_cache = None
+        if SEARCH_CACHE_MAX_MB > 0:
+            try:
+                self.search_cache = SearchCache(
+                    SEARCH_CACHE_PATH,
+                    int(SEARCH_CACHE_MAX_MB * 1024 * 1024),
+                    SEARCH_CACHE_TTL_HOURS * 3600
+                )
+            except (sqlite3.Error, OSError) as e:
+                # Searching works without the cache; it only costs repeat queries
+                print(f"Search cache unavailable at {SEARCH_CACHE_PATH}, searching without it: {e}", file=sys.stderr)
+
+    @property
+    def ddg(self):
+        """DuckDuckGo client of the calling thread, created on its first search"""
+        if getattr(self._local, 'ddg', None) is None:
+            from duckduckgo_search import DDGS
+            self._local.ddg = DDGS()
+        return self._local.ddg
 
     def find_similar_contracts(self, user_contract_text):
         """Complete free AI-powered contract search"""
@@ -57,13 +171,10 @@ class FreeAIContractSearcher:
         """
 
         try:
+            cache_key = None
             if self.client:
                 # Use Groq
-                response = self.client.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model=self.model_name
-                )
-                result = response.choices[0].message.content
+                result, cache_key = self.complete(prompt)
             else:
                 # Fallback to pattern matching if no API
                 result = self.basic_contract_analysis(contract_text)
@@ -73,13 +184,57 @@ class FreeAIContractSearcher:
             json_end = result.rfind('}') + 1
             if json_start != -1 and json_end != -1:
                 json_str = result[json_start:json_end]
-                return json.loads(json_str)
+                analysis = json.loads(json_str)
+                self.cache_reply(cache_key, result)
+                return analysis
             else:
                 return self.basic_contract_analysis(contract_text)
 
         except Exception as e:
             return self.basic_contract_analysis(contract_text)
 
+    def complete(self, prompt, timeout=None):
+        """Send one prompt to Groq within the shared request and token budgets.
+
+        Returns the reply and the key to cache it under with cache_reply() once the caller has
+        parsed it, or None when it came from the LLM cache (those cost no request or tokens) or
+        caching is off. With a timeout (seconds), waiting for budget counts against it and the
+        request is not retried.
+        """
+        cache_key = None
+        if self.llm_cache is not None:
+            cache_key = prompt_cache_key(self.model_name, prompt)
+            if not self.bypass_llm_cache:
+                cached = self.llm_cache.get(cache_key)
+                if cached is not None:
+                    return cached, None
+
+        started = time.monotonic()
+        estimated_tokens = len(prompt) // 4 + GROQ_COMPLETION_TOKENS
+        if not GROQ_REQUEST_LIMITER.acquire(1, timeout):
+            raise Exception("Groq request budget exhausted")
+        remaining = None if timeout is None else timeout - (time.monotonic() - started)
+        if not GROQ_TOKEN_LIMITER.acquire(estimated_tokens, remaining):
+            raise Exception("Groq token budget exhausted")
+
+        client = self.client
+        if timeout is not None:
+            client = client.with_options(timeout=max(timeout - (time.monotonic() - started), 0.1), max_retries=0)
+        response = client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=self.model_name
+        )
+        return response.choices[0].message.content, cache_key
+
+    def cache_reply(self, cache_key, reply):
+        """Store a Groq reply that parsed, so a malformed one is never replayed from the cache"""
+        if cache_key is None:
+            return
+        try:
+            self.llm_cache.set(cache_key, reply)
+        except Exception:
+            pass
+
     def basic_contract_analysis(self, contract_text):
         """Fallback analysis without AI"""
         text_lower = contract_text.lower()
@@ -114,36 +269,59 @@ class FreeAIContractSearcher:
         }
 
     def free_web_search(self, contract_analysis):
-        """Free web search using DuckDuckGo"""
-        all_results = []
+        """Free web search using DuckDuckGo, with the queries run concurrently under DDG_LIMITER.
 
-        search_queries = contract_analysis.get('search_queries', [])
+        Queries overlap, so results that are the same page are merged before anything ranks them.
+        """
+        search_queries = contract_analysis.get('search_queries', [])[:5]  # Limit to 5 queries
+        if not search_queries:
+            return []
 
-        for query in search_queries[:5]:  # Limit to 5 queries
+        with ThreadPoolExecutor(max_workers=min(len(search_queries), max(DDG_CONCURRENCY, 1))) as executor:
+            # map keeps the results in query order, as the sequential loop did
+            batches = list(executor.map(self.search_query, search_queries))
+
+        from result_dedupe import collapse_duplicates
+        return collapse_duplicates([result for batch in batches for result in batch], DEDUPE_SIMHASH_DISTANCE)
+
+    def search_query(self, query):
+        """Run one DuckDuckGo query from the search cache, or once the shared rate limiter lets it start"""
+        search_text = query + " legal document contract"
+        results = None
+        cache_key = None
+        if self.search_cache is not None:
+            cache_key = search_cache_key(search_text, 'us-en', 5)
+            results = self.search_cache.get(cache_key)
+
+        if results is None:
+            # Rate limiting (be nice to free services)
+            DDG_LIMITER.acquire()
             try:
                 # Search with DuckDuckGo (completely free)
                 results = list(self.ddg.text(
-                    query + " legal document contract",
+                    search_text,
                     max_results=5,
                     region='us-en'
                 ))
-
-                for result in results:
-                    all_results.append({
-                        'title': result['title'],
-                        'url': result['href'],
-                        'snippet': result['body'],
-                        'source': self.identify_source(result['href']),
-                        'query_used': query
-                    })
-
-                # Rate limiting (be nice to free services)
-                time.sleep(2)
-
-            except Exception as e:
-                continue
-
-        return all_results
+            except Exception:
+                return []
+            if cache_key is not None:
+                try:
+                    self.search_cache.set(cache_key, results)
+                except Exception:
+                    # A cache that can't be written only costs the next search a query
+                    pass
+
+        return [
+            {
+                'title': result['title'],
+                'url': result['href'],
+                'snippet': result['body'],
+                'source': self.identify_source(result['href']),
+                'query_used': query
+            }
+            for result in results
+        ]
 
     def identify_source(self, url):
         """Identify the source of the document"""
@@ -161,24 +339,52 @@ class FreeAIContractSearcher:
             return 'Legal Resource'
 
     def rank_results_free(self, original_contract, search_results):
-        """Free AI ranking using Gemini Flash"""
+        """Rank results by similarity to the contract: all of them locally, then the best candidates with Groq.
+
+        The local scores are the whole ranking without an API key, pick which results are worth
+        LLM tokens, and stand in for any batch the LLM can't rank.
+        """
 
         if not search_results:
             return []
 
-        # Process in smaller batches for free tier limits
-        batch_size = 5
-        ranked_results = []
+        from local_ranker import LocalRanker
 
-        for i in range(0, len(search_results), batch_size):
-            batch = search_results[i:i+batch_size]
+        self.score_locally(LocalRanker(original_contract), search_results)
 
-            ranking_prompt = f"""
+        if self.client:
+            candidates = sorted(search_results, key=lambda x: x['similarity_score'], reverse=True)
+            candidates = candidates[:max(GROQ_RANK_CANDIDATES, 1)]
+            # Process in smaller batches for free tier limits
+            batch_size = 5
+            batches = [candidates[i:i + batch_size] for i in range(0, len(candidates), batch_size)]
+            with ThreadPoolExecutor(max_workers=min(len(batches), max(GROQ_MAX_IN_FLIGHT, 1))) as executor:
+                ranked_batches = list(executor.map(lambda batch: self.rank_batch(original_contract, batch), batches))
+            ranked_results = [result for batch in ranked_batches for result in batch]
+        else:
+            # No AI available - local scores only
+            ranked_results = list(search_results)
+
+        # Sort by similarity score
+        ranked_results.sort(key=lambda x: x.get('similarity_score', 0), reverse=True)
+
+        return ranked_results[:15]  # Return top 15
+
+    def rank_batch(self, original_contract, batch):
+        """Rank one batch of results with the LLM, keeping their local scores if that fails or times out"""
+        unscored = [
+            {
+                key: value for key, value in result.items()
+                if key not in ('similarity_score', 'explanation', 'queries_used', 'duplicate_urls')
+            }
+            for result in batch
+        ]
+        ranking_prompt = f"""
             Original contract type and key info:
             {original_contract[:500]}...
 
             Rank these search results by similarity to the original contract:
-            {json.dumps(batch, indent=2)}
+            {json.dumps(unscored, indent=2)}
 
             For each result, assign a similarity score (0-100) and brief explanation.
             Focus on: contract type match, subject matter relevance, source credibility.
@@ -196,70 +402,50 @@ class FreeAIContractSearcher:
             ]
             """
 
-            try:
-                if self.client:
-                    response = self.client.chat.completions.create(
-                        messages=[{"role": "user", "content": ranking_prompt}],
-                        model=self.model_name
-                    )
-                    result_text = response.choices[0].message.content
-
-                    # Extract JSON
-                    json_start = result_text.find('[')
-                    json_end = result_text.rfind(']') + 1
-
-                    if json_start != -1 and json_end != -1:
-                        json_str = result_text[json_start:json_end]
-                        batch_ranked = json.loads(json_str)
-                        ranked_results.extend(batch_ranked)
-                    else:
-                        # Fallback: assign default scores
-                        for result in batch:
-                            result['similarity_score'] = 50
-                            result['explanation'] = "Basic relevance match"
-                        ranked_results.extend(batch)
-                else:
-                    # No AI available - basic scoring
-                    for result in batch:
-                        score = self.calculate_basic_similarity(original_contract, result)
-                        result['similarity_score'] = score
-                        result['explanation'] = f"Keyword match score: {score}"
-                    ranked_results.extend(batch)
-
-                time.sleep(1)  # Rate limiting for free tier
-
-            except Exception as e:
-                # Fallback scoring
-                for result in batch:
-                    result['similarity_score'] = 50
-                    result['explanation'] = "Could not analyze similarity"
-                ranked_results.extend(batch)
-
-        # Sort by similarity score
-        ranked_results.sort(key=lambda x: x.get('similarity_score', 0), reverse=True)
-
-        return ranked_results[:15]  # Return top 15
-
-    def calculate_basic_similarity(self, original_contract, search_result):
-        """Basic similarity calculation without AI"""
-        original_words = set(original_contract.lower().split())
-        result_words = set((search_result['title'] + ' ' + search_result['snippet']).lower().split())
-
-        # Calculate word overlap
-        common_words = original_words.intersection(result_words)
-        similarity = len(common_words) / max(len(original_words), len(result_words), 1) * 100
-
-        # Boost score for legal sources
-        if search_result['source'] in ['SEC EDGAR', 'Court Records', 'Government']:
-            similarity += 20
+        try:
+            result_text, cache_key = self.complete(ranking_prompt, timeout=GROQ_RANK_TIMEOUT_SECONDS)
 
-        return min(similarity, 100)
+            # Extract JSON
+            json_start = result_text.find('[')
+            json_end = result_text.rfind(']') + 1
 
+            if json_start != -1 and json_end != -1:
+                # The reply only echoes some fields; the rest (queries_used, ...) come from the batch
+                originals = {result['url']: result for result in batch}
+                ranked_batch = [
+                    {**originals.get(ranked.get('url'), {}), **ranked}
+                    for ranked in json.loads(result_text[json_start:json_end])
+                ]
+                self.cache_reply(cache_key, result_text)
+                return ranked_batch
+        except Exception:
+            pass
+
+        # Fallback: the local scores already on the batch
+        return batch
+
+    def score_locally(self, ranker, results):
+        """Give every result its LocalRanker similarity score, all in one vectorised pass"""
+        for result, score in zip(results, ranker.scores(results)):
+            result['similarity_score'] = round(float(score), 1)
+            result['explanation'] = f"Term similarity score: {result['similarity_score']}"
+        return results
 
 def main():
-    # Initialize with Groq API key (optional)
-    groq_key = os.getenv('GROQ_API_KEY')
-    searcher = FreeAIContractSearcher(groq_key)
+    if '--startup-profile' in sys.argv[1:]:
+        from startup_profile import profile_startup
+        report = profile_startup(os.path.abspath(__file__), STARTUP_PROFILE_MODULES, STARTUP_BUDGET_MS)
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report["within_budget"] else 1)
+
+    if '--cache-stats' in sys.argv[1:]:
+        # Hit rates and sizes of the shared search and LLM caches
+        searcher = FreeAIContractSearcher()
+        print(json.dumps({
+            "search": searcher.search_cache.stats() if searcher.search_cache else None,
+            "llm": searcher.llm_cache.stats() if searcher.llm_cache else None
+        }, indent=2))
+        return
 
     # Read contract text from stdin
     contract_text = sys.stdin.read().strip()
@@ -268,6 +454,10 @@ def main():
         print(json.dumps({"error": "No contract text provided"}))
         return
 
+    # Initialize with Groq API key (optional)
+    groq_key = os.getenv('GROQ_API_KEY')
+    searcher = FreeAIContractSearcher(groq_key, LLM_CACHE_BYPASS or '--no-llm-cache' in sys.argv[1:])
+
     try:
         # Find similar contracts
         results = searcher.find_similar_contracts(contract_text)